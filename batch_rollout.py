@@ -0,0 +1,97 @@
+import numpy as np
+from bit_board import WIN_TABLE, EMPTY_CELLS, FULL_MASK
+from game_board import CellState, GameState, NineBoard
+
+
+WIN = np.array(WIN_TABLE)
+EMPTY_COUNT = np.array([len(cells) for cells in EMPTY_CELLS])
+# KTH_EMPTY[occupied_mask, k] is the k-th empty cell of a mini-board
+KTH_EMPTY = np.array([list(cells) + [0] * (9 - len(cells)) for cells in EMPTY_CELLS])
+BOARDS = np.arange(9)
+
+
+def encode(boards):
+    # N positions as arrays: X and O occupancy masks (N x 9), overall won/closed masks,
+    # next board (-1 = free choice), side to move and current result
+    masks = [b.masks() for b in boards]
+    x_masks = np.array([x for x, _ in masks], dtype=np.int64)
+    o_masks = np.array([o for _, o in masks], dtype=np.int64)
+    x_won = WIN[x_masks] @ (1 << BOARDS)
+    o_won = WIN[o_masks] @ (1 << BOARDS)
+    closed = x_won | o_won | ((x_masks | o_masks) == FULL_MASK) @ (1 << BOARDS)
+    next_board = np.array([-1 if b.next_board_index is None else b.next_board_index for b in boards])
+    x_to_move = np.array([b.current_player == CellState.X for b in boards])
+    results = np.array([b.result() for b in boards])
+    return x_masks, o_masks, x_won, o_won, closed, next_board, x_to_move, results
+
+
+def play(x_masks, o_masks, x_won, o_won, closed, next_board, x_to_move, results, lite=False, rng=None):
+    # Advances every unfinished position by one uniformly random legal move per vectorized step,
+    # dropping positions from the working arrays as they finish. Fills in and returns results
+    rng = np.random.default_rng(rng)  # Accepts None, a seed or a Generator
+    index = np.flatnonzero(results == GameState.ONGOING)
+    x_masks, o_masks = x_masks[index], o_masks[index]
+    x_won, o_won, closed = x_won[index], o_won[index], closed[index]
+    next_board, x_to_move = next_board[index], x_to_move[index]
+    while index.size:
+        games = np.arange(index.size)
+        occupied = x_masks | o_masks
+        open_boards = (closed[:, None] >> BOARDS & 1) == 0
+        forced = next_board >= 0
+        forced[forced] = open_boards[games[forced], next_board[forced]]
+        open_boards[forced] = BOARDS == next_board[forced, None]
+
+        # Pick uniformly among legal moves: choose a board weighted by its empty cells, then a cell in it
+        weights = EMPTY_COUNT[occupied] * open_boards
+        cumulative = weights.cumsum(axis=1)
+        pick = (rng.random(index.size) * cumulative[:, -1]).astype(np.int64)
+        board_index = (cumulative <= pick[:, None]).sum(axis=1)
+        offset = pick - cumulative[games, board_index] + weights[games, board_index]
+        cell_index = KTH_EMPTY[occupied[games, board_index], offset]
+
+        cell_bit = 1 << cell_index
+        x_mask = x_masks[games, board_index] | np.where(x_to_move, cell_bit, 0)
+        o_mask = o_masks[games, board_index] | np.where(x_to_move, 0, cell_bit)
+        x_masks[games, board_index] = x_mask
+        o_masks[games, board_index] = o_mask
+
+        board_bit = 1 << board_index
+        board_x_won, board_o_won = WIN[x_mask], WIN[o_mask]
+        x_won |= np.where(board_x_won, board_bit, 0)
+        o_won |= np.where(board_o_won, board_bit, 0)
+        closed |= np.where(board_x_won | board_o_won | ((x_mask | o_mask) == FULL_MASK), board_bit, 0)
+
+        if lite:
+            x_game, o_game = x_won != 0, o_won != 0
+        else:
+            x_game, o_game = WIN[x_won], WIN[o_won]
+        game_results = np.select([x_game, o_game, closed == FULL_MASK],
+                                 [GameState.X_WIN, GameState.O_WIN, GameState.DRAW], GameState.ONGOING)
+
+        next_board = cell_index
+        x_to_move = ~x_to_move
+        ended = game_results != GameState.ONGOING
+        if ended.any():
+            results[index[ended]] = game_results[ended]
+            running = ~ended
+            index, x_masks, o_masks = index[running], x_masks[running], o_masks[running]
+            x_won, o_won, closed = x_won[running], o_won[running], closed[running]
+            next_board, x_to_move = next_board[running], x_to_move[running]
+    return results
+
+
+def playouts(board, num_games, rng=None):
+    # Results of num_games random playouts from one position. Each call pays a fixed NumPy overhead of
+    # several milliseconds, so this pays off only for many games at once
+    arrays = [np.repeat(array, num_games, axis=0) for array in encode([board])]
+    return play(*arrays, lite=board.lite, rng=rng)
+
+
+def batch_playouts(boards, rng=None):
+    # Result of one random playout from each of several positions of the same game mode
+    return play(*encode(boards), lite=boards[0].lite, rng=rng)
+
+
+def random_games(num_games, lite=False, rng=None):
+    # Results of num_games random games from the empty board
+    return playouts(NineBoard(lite), num_games, rng)
@@ -0,0 +1,244 @@
+import json
+import os
+import platform
+import random
+import time
+from datetime import datetime
+
+from bit_board import BitNineBoard
+from evaluation import Evaluation
+from game_board import CellState, GameState, NineBoard
+from mcts import MCTSPlayer
+from minimax import MiniMaxPlayer
+from move_ordering import MoveOrdering
+from random_player import RandomPlayer
+
+
+CATEGORIES = ['opening', 'free_choice', 'endgame', 'lite']
+
+
+def empty_cells(board):
+    return sum(board.mini_board(i).count(CellState.EMPTY)
+               for i in range(9) if board.overall_board[i] == GameState.ONGOING)
+
+
+def wanted(category, board, rng):
+    # Whether a random game has reached a position of this category
+    if category == 'opening':
+        return len(board.history) >= rng.randrange(2, 7)
+    elif category == 'free_choice':
+        return len(board.history) >= 20 and board.next_board_index is not None and \
+            board.overall_board[board.next_board_index] != GameState.ONGOING
+    elif category == 'endgame':
+        return empty_cells(board) <= 20
+    else:
+        return len(board.history) >= rng.randrange(3, 11)
+
+
+def build_corpus(seed=0, size=8):
+    # {category: [move list]} of non-terminal positions reached by seeded random games,
+    # kept as moves so they can be replayed on any board engine
+    rng = random.Random(seed)
+    corpus = {}
+    for category in CATEGORIES:
+        corpus[category] = []
+        while len(corpus[category]) < size:
+            board = NineBoard(lite=category == 'lite')
+            while not board.terminal() and not wanted(category, board, rng):
+                board.make_move(*rng.choice(board.actions()))
+            if not board.terminal():
+                corpus[category].append([entry[:2] for entry in board.history])
+    return corpus
+
+
+def replay(moves, board_class=NineBoard, lite=False):
+    board = board_class(lite)
+    for move in moves:
+        board.make_move(*move)
+    return board
+
+
+def positions(corpus, categories=CATEGORIES, board_class=NineBoard):
+    return [replay(moves, board_class, category == 'lite')
+            for category in categories for moves in corpus[category]]
+
+
+def best_time(function, repeat):
+    # Fastest of repeat runs: the least disturbed by other load on the machine
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def bench_board(corpus, repeat):
+    results = {}
+    for engine, board_class in (('nine_board', NineBoard), ('bit_board', BitNineBoard)):
+        boards = positions(corpus, board_class=board_class)
+        moves = [(board, board.actions()) for board in boards]
+        count = sum(len(actions) for _, actions in moves)
+
+        def make_undo():
+            for _ in range(100):
+                for board, actions in moves:
+                    for action in actions:
+                        board.make_move(*action)
+                        board.undo_move(*action)
+
+        def actions():
+            for _ in range(1000):
+                for board in boards:
+                    board.actions()
+
+        def result():
+            for _ in range(10000):
+                for board in boards:
+                    board.result()
+
+        results[f'board.{engine}.make_undo'] = 100 * count / best_time(make_undo, repeat)
+        results[f'board.{engine}.actions'] = 1000 * len(boards) / best_time(actions, repeat)
+        results[f'board.{engine}.result'] = 10000 * len(boards) / best_time(result, repeat)
+    return results
+
+
+def bench_evaluation(corpus, repeat):
+    results = {}
+    boards = positions(corpus)
+    for name, evaluation in (('e1', Evaluation(Evaluation.CONFIG_ONE)),
+                             ('e2', Evaluation(Evaluation.CONFIG_TWO, True))):
+        def evaluate():
+            for _ in range(1000):
+                for board in boards:
+                    evaluation.evaluate(board)
+
+        results[f'evaluate.{name}'] = 1000 * len(boards) / best_time(evaluate, repeat)
+    return results
+
+
+def bench_minimax(corpus, repeat, depths=(4, 6, 8)):
+    # Nodes per second of the create_player_list minimax configuration; deeper searches get fewer positions
+    results = {}
+    for depth in depths:
+        boards = positions(corpus, ['opening', 'free_choice'])[:max(1, 2 ** (9 - depth))]
+        player = MiniMaxPlayer(f'D{depth}', Evaluation(Evaluation.CONFIG_ONE, incremental=True), depth,
+                               ordering=MoveOrdering())
+        nodes = 0
+
+        def search():
+            nonlocal nodes
+            nodes = 0
+            player.table = None
+            player.ordering = MoveOrdering()
+            for board in boards:
+                player.make_decision(board)
+                nodes += player.nodes
+
+        elapsed = best_time(search, repeat)
+        results[f'minimax.d{depth}.nodes'] = nodes / elapsed
+    return results
+
+
+def bench_mcts(corpus, repeat, iterations=1000):
+    results = {}
+    for rollout in ('fast', 'board'):
+        for category in CATEGORIES:
+            boards = positions(corpus, [category])[:2]
+
+            def search():
+                for board in boards:
+                    MCTSPlayer('MCTS', None, rollout=rollout, reuse_tree=False, iterations=iterations,
+                               seed=0).make_decision(board)
+
+            results[f'mcts.{rollout}.{category}.playouts'] = iterations * len(boards) / best_time(search, repeat)
+    return results
+
+
+def bench_tournament(repeat, num_games=16):
+    from main import play_games_parallel  # Imports the plotting and pandas dependencies of main
+
+    x_player = MiniMaxPlayer('AI D4E1', Evaluation(Evaluation.CONFIG_ONE, incremental=True), 4, ordering=MoveOrdering())
+    o_player = RandomPlayer('Random')
+    elapsed = best_time(lambda: play_games_parallel(x_player, o_player, num_games, False), repeat)
+    return {'tournament.play_games_parallel.games': num_games / elapsed}
+
+
+def run_benchmarks(seed=0, size=8, repeat=3, quick=False):
+    corpus = build_corpus(seed, size)
+    results = {}
+    results.update(bench_board(corpus, repeat))
+    results.update(bench_evaluation(corpus, repeat))
+    results.update(bench_minimax(corpus, repeat, (4, 6) if quick else (4, 6, 8)))
+    results.update(bench_mcts(corpus, repeat, 200 if quick else 1000))
+    if not quick:
+        results.update(bench_tournament(repeat))
+    return {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed': seed,
+            'size': size,
+            'repeat': repeat,
+            'quick': quick,
+        },
+        'results': results,  # Every metric is a rate: operations, nodes, playouts or games per second
+    }
+
+
+def compare(results, baseline, tolerance=0.15):
+    # (metric, baseline rate, current rate, ratio, regressed) for metrics present in both runs
+    rows = []
+    for metric, value in results['results'].items():
+        if metric in baseline['results']:
+            ratio = value / baseline['results'][metric]
+            rows.append((metric, baseline['results'][metric], value, ratio, ratio < 1 - tolerance))
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Benchmark board, search and tournament hot paths')
+    parser.add_argument('-o', '--output',
+                        help='JSON file for the results (default: data/benchmark_<timestamp>.json)')
+    parser.add_argument('-b', '--baseline',
+                        default='data/benchmark_baseline.json',
+                        help='Results to compare against')
+    parser.add_argument('--save-baseline',
+                        action='store_true',
+                        help='Also store these results as the new baseline')
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=0.15,
+                        help='Slowdown, as a fraction of the baseline rate, reported as a regression')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the position corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the fastest counts')
+    parser.add_argument('--quick', action='store_true', help='Skip D8 minimax and the tournament benchmark')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.seed, repeat=args.repeat, quick=args.quick)
+    output = args.output or f"data/benchmark_{datetime.now().strftime('%Y%m%d%H%M%S')}.json"
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {output}")
+
+    regressions = 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        for metric, baseline_value, value, ratio, regressed in compare(results, baseline, args.tolerance):
+            regressions += regressed
+            print(f"{metric:45} {baseline_value:14.1f} -> {value:14.1f}  {ratio:6.2f}x{'  REGRESSION' if regressed else ''}")
+    else:
+        for metric, value in results['results'].items():
+            print(f"{metric:45} {value:14.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    sys.exit(1 if regressions else 0)
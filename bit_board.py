@@ -0,0 +1,171 @@
+from game_board import (CellState, GameState, NineBoard, WIN_COMBINATIONS,
+                        ZOBRIST_CELLS, ZOBRIST_O_TO_MOVE, ZOBRIST_NEXT_BOARD, ZOBRIST_LITE)
+
+
+FULL_MASK = 0b111111111
+LINE_MASKS = [(1 << i) | (1 << j) | (1 << k) for i, j, k in WIN_COMBINATIONS]
+
+# 512-entry tables indexed by a 9-bit occupancy mask of one 3x3 board
+WIN_TABLE = [any(mask & line == line for line in LINE_MASKS) for mask in range(512)]
+EMPTY_CELLS = [tuple(i for i in range(9) if not mask >> i & 1) for mask in range(512)]
+# Cells, as a mask, that would complete a line for the player owning mask (whether or not the opponent holds them)
+WIN_CELLS = [sum(1 << i for i in EMPTY_CELLS[mask] if WIN_TABLE[mask | 1 << i]) for mask in range(512)]
+# Legal moves of mini-board b given its occupancy mask, already as (board, cell) tuples
+MOVE_TABLE = [[tuple((b, c) for c in EMPTY_CELLS[mask]) for mask in range(512)] for b in range(9)]
+
+
+def _build_cell_table():
+    # Cell tuples for every reachable (x_mask, o_mask) pair, indexed by x_mask << 9 | o_mask
+    table = [None] * (1 << 18)
+    for x_mask in range(512):
+        free = FULL_MASK ^ x_mask
+        o_mask = free
+        while True:
+            table[x_mask << 9 | o_mask] = tuple(
+                CellState.X if x_mask >> i & 1 else CellState.O if o_mask >> i & 1 else CellState.EMPTY
+                for i in range(9))
+            if o_mask == 0:
+                break
+            o_mask = (o_mask - 1) & free
+    return table
+
+
+CELL_TABLE = _build_cell_table()
+
+
+def mini_board_state(x_mask, o_mask):
+    if WIN_TABLE[x_mask]:
+        return GameState.X_WIN
+    elif WIN_TABLE[o_mask]:
+        return GameState.O_WIN
+    elif x_mask | o_mask == FULL_MASK:
+        return GameState.DRAW
+    else:
+        return GameState.ONGOING
+
+
+class BitNineBoard(NineBoard):
+    def __init__(self, lite=False):
+        self.x_masks = [0] * 9
+        self.o_masks = [0] * 9
+        self.overall_board = [GameState.ONGOING for _ in range(9)]
+        # Overall-board masks: boards won by X, won by O, and no longer playable
+        self.x_won = 0
+        self.o_won = 0
+        self.closed = 0
+        self.current_player = CellState.X
+        self.next_board_index = None
+        self.lite = lite
+        # Kept up to date by make_move/undo_move, as in NineBoard
+        self.game_result = GameState.ONGOING
+        self.hash = ZOBRIST_NEXT_BOARD[9] ^ (ZOBRIST_LITE if lite else 0)
+        # (board_index, cell_index, next_board_index, board_state, game_result, x_won, o_won, closed, hash)
+        # before each move, so undo_move restores instead of recomputing
+        self.history = []
+        self.score_tracker = None
+
+    @property
+    def boards(self):
+        return [CELL_TABLE[x << 9 | o] for x, o in zip(self.x_masks, self.o_masks)]
+
+    def mini_board(self, board_index):
+        return CELL_TABLE[self.x_masks[board_index] << 9 | self.o_masks[board_index]]
+
+    def masks(self):
+        return self.x_masks[:], self.o_masks[:]
+
+    def make_move(self, board_index, cell_index):
+        previous_state = self.overall_board[board_index]
+        self.history.append((board_index, cell_index, self.next_board_index, previous_state, self.game_result,
+                             self.x_won, self.o_won, self.closed, self.hash))
+        self.hash ^= self.next_board_key() ^ ZOBRIST_CELLS[self.current_player][board_index * 9 + cell_index] ^ ZOBRIST_O_TO_MOVE
+        if self.current_player == CellState.X:
+            x_mask = self.x_masks[board_index] | 1 << cell_index
+            o_mask = self.o_masks[board_index]
+            self.x_masks[board_index] = x_mask
+            self.current_player = CellState.O
+        else:
+            x_mask = self.x_masks[board_index]
+            o_mask = self.o_masks[board_index] | 1 << cell_index
+            self.o_masks[board_index] = o_mask
+            self.current_player = CellState.X
+
+        state = mini_board_state(x_mask, o_mask)
+        if state != previous_state:
+            self.overall_board[board_index] = state
+            self.update_game_result(board_index, state)
+        if self.score_tracker is not None:
+            self.score_tracker.update(self, board_index, state != previous_state)
+
+        self.next_board_index = cell_index
+        self.hash ^= self.next_board_key()
+
+    def undo_move(self, board_index, cell_index):
+        (_, _, self.next_board_index, previous_state, self.game_result,
+         self.x_won, self.o_won, self.closed, self.hash) = self.history.pop()
+        bit = 1 << cell_index
+        if self.x_masks[board_index] & bit:
+            self.x_masks[board_index] ^= bit
+            self.current_player = CellState.X
+        else:
+            self.o_masks[board_index] ^= bit
+            self.current_player = CellState.O
+
+        state_changed = self.overall_board[board_index] != previous_state
+        if state_changed:
+            self.overall_board[board_index] = previous_state
+        if self.score_tracker is not None:
+            self.score_tracker.update(self, board_index, state_changed)
+
+    def update_game_result(self, board_index, state):
+        bit = 1 << board_index
+        self.closed |= bit
+        if state == GameState.X_WIN:
+            self.x_won |= bit
+            won = self.x_won
+        elif state == GameState.O_WIN:
+            self.o_won |= bit
+            won = self.o_won
+        else:
+            won = 0
+        if won and (self.lite or WIN_TABLE[won]):
+            self.game_result = state
+        elif self.closed == FULL_MASK:
+            self.game_result = GameState.DRAW
+
+    def next_board_key(self):
+        index = self.next_board_index
+        if index is None or self.closed >> index & 1:
+            return ZOBRIST_NEXT_BOARD[9]
+        return ZOBRIST_NEXT_BOARD[index]
+
+    def actions(self):
+        closed = self.closed
+        index = self.next_board_index
+        if index is None or closed >> index & 1:
+            moves = []
+            for i in range(9):
+                if not closed >> i & 1:
+                    moves.extend(MOVE_TABLE[i][self.x_masks[i] | self.o_masks[i]])
+            return moves
+        return list(MOVE_TABLE[index][self.x_masks[index] | self.o_masks[index]])
+
+    def update_mini_board_game_state(self, board_index):
+        return mini_board_state(self.x_masks[board_index], self.o_masks[board_index])
+
+    def copy(self):
+        new_board = BitNineBoard(lite=self.lite)
+        new_board.x_masks = self.x_masks[:]
+        new_board.o_masks = self.o_masks[:]
+        new_board.overall_board = self.overall_board[:]
+        new_board.x_won = self.x_won
+        new_board.o_won = self.o_won
+        new_board.closed = self.closed
+        new_board.game_result = self.game_result
+        new_board.current_player = self.current_player
+        new_board.next_board_index = self.next_board_index
+        new_board.hash = self.hash
+        new_board.history = self.history[:]
+        if self.score_tracker is not None:
+            new_board.score_tracker = self.score_tracker.copy()
+        return new_board
@@ -2,50 +2,44 @@ import pandas as pd
 from glicko2 import Player
 import matplotlib.pyplot as plt
 from matplotlib.table import Table
-import ast
+from ratings import RatingEngine
+from tournament import load_pairings, pairings_frame, read_log
 
 # Load your data (replace with your actual data path)
 
-def extract_wins(cell_value):
-    if isinstance(cell_value, str):
-        wins_data = ast.literal_eval(cell_value)
-        if isinstance(wins_data, tuple):
-            return wins_data[0][0], wins_data[0][1]  # X wins, O wins
-    return 0, 0
+def load_results(path, num_games=100):
+    # Pairing rows (see tournament.PAIRING_COLUMNS) from a competition CSV of either layout or a game log.
+    # num_games is only used for the older matrix CSVs, which do not record it
+    if path.endswith('.jsonl'):
+        return pairings_frame(read_log(path))
+    return load_pairings(path, num_games)
 
 
-def extract_durations(cell_value):
-    if isinstance(cell_value, str):
-        data = ast.literal_eval(cell_value)
-        if isinstance(data, tuple):
-            return data[1], data[2]
-    return 0, 0
+def player_names(data):
+    return list(pd.unique(pd.concat([data['x_player'], data['o_player']])))
 
 
-def analyze_glicko2(data, total_games=100):
-    # Initialize Glicko-2 players (default rating 1500, RD 350, volatility 0.06)
-    glicko_players = {player: Player() for player in data.columns[1:]}
+def scores(data):
+    # Score rate of each side of every pairing, a draw counting as half a win
+    x_score = (data['x_wins'] + 0.5 * data['draws']) / data['games']
+    o_score = (data['o_wins'] + 0.5 * data['draws']) / data['games']
+    return x_score, o_score
 
-    # Iterate through the matchups and update Glicko-2 ratings
-    for i, player_row in data.iterrows():
-        player = player_row['Unnamed: 0']  # The player in the row
-        for opponent in data.columns[1:]:
-            if player != opponent: # Skip the same player
-                # Extract number of X and O wins
-                x_wins, o_wins = extract_wins(player_row[opponent])
 
-                # Player as X and opponent as O
-                num_draws = total_games - x_wins - o_wins
-                x_win_rate = (x_wins + num_draws * 0.5) / total_games
-                o_win_rate = (o_wins + num_draws * 0.5) / total_games
+def analyze_glicko2(data):
+    # Initialize Glicko-2 players (default rating 1500, RD 350, volatility 0.06)
+    glicko_players = {player: Player() for player in player_names(data)}
 
-                # Update Glicko-2 ratings for both players
-                x_player = glicko_players[player]
-                o_player = glicko_players[opponent]
+    # Update Glicko-2 ratings pairing by pairing, skipping self-play
+    games = data[data['x_player'] != data['o_player']]
+    x_score, o_score = scores(games)
+    for x_name, o_name, x_win_rate, o_win_rate in zip(games['x_player'], games['o_player'], x_score, o_score):
+        x_player = glicko_players[x_name]
+        o_player = glicko_players[o_name]
 
-                # Update ratings based on match outcome
-                x_player.update_player([o_player.rating], [o_player.rd], [x_win_rate])
-                o_player.update_player([x_player.rating], [x_player.rd], [o_win_rate])
+        # Update ratings based on match outcome
+        x_player.update_player([o_player.rating], [o_player.rd], [x_win_rate])
+        o_player.update_player([x_player.rating], [x_player.rd], [o_win_rate])
 
     # Extract and display the Glicko-2 ratings
     for player, player_obj in glicko_players.items():
@@ -53,9 +47,9 @@ def analyze_glicko2(data, total_games=100):
 
 
     ratings = [player_obj.rating for player_obj in glicko_players.values()]
-    player_names = list(glicko_players.keys())
+    player_names_list = list(glicko_players.keys())
     plt.figure(figsize=(10, 6))
-    bars = plt.bar(player_names, ratings, color='b')
+    bars = plt.bar(player_names_list, ratings, color='b')
     plt.axhline(y=1500, color='r', linestyle='--')  # Horizontal line at y=1500
     plt.title('Skill level of agents (using Glicko-2 ratings system)')
     # plt.xlabel('Agents')
@@ -66,74 +60,79 @@ def analyze_glicko2(data, total_games=100):
     plt.show()
 
 
+def analyze_ratings(log_path, period_games=100):
+    # Game-by-game Glicko-2 ratings from a game log, with 95% confidence intervals as error bars
+    engine = RatingEngine(period_games)
+    engine.update_from_log(log_path)
+    engine.end_period()
+    ratings = pd.DataFrame.from_dict(engine.ratings(), orient='index')
+    for player, rating in ratings.iterrows():
+        print(f"Player: {player}, Rating: {rating['rating']}, RD: {rating['rd']}, Volatility: {rating['vol']}, "
+              f"95% CI: {rating['low']:.0f} - {rating['high']:.0f}")
+
+    plt.figure(figsize=(10, 6))
+    bars = plt.bar(ratings.index, ratings['rating'], yerr=1.96 * ratings['rd'], capsize=4, color='b')
+    plt.axhline(y=1500, color='r', linestyle='--')  # Horizontal line at y=1500
+    plt.title(f'Skill level of agents (Glicko-2, {engine.periods} rating periods of {period_games} games)')
+    plt.ylabel('Rating')
+
+    for bar in bars:
+        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height(), f'{bar.get_height():.2f}', ha='center', va='bottom')
+    plt.show()
+
+
 def show_matchup_data(data):
-    player_names = data.columns[1:]
-    matchup_data = [[extract_wins(player_row[opponent]) for opponent in data.columns[1:]] for _, player_row in data.iterrows()]
-    
+    names = player_names(data)
+    x_wins = data.pivot(index='x_player', columns='o_player', values='x_wins').reindex(index=names, columns=names)
+    o_wins = data.pivot(index='x_player', columns='o_player', values='o_wins').reindex(index=names, columns=names)
+    x_wins, o_wins = x_wins.fillna(0).astype(int), o_wins.fillna(0).astype(int)
+
     # Create a DataFrame with player names as index and columns
-    df = pd.DataFrame(matchup_data, index=player_names, columns=player_names)
-    
+    df = pd.DataFrame([[(x, o) for x, o in zip(x_row, o_row)] for x_row, o_row in zip(x_wins.values, o_wins.values)],
+                      index=names, columns=names)
+
     # Display the matchup data as a table
     plt.figure(figsize=(12, 3))
     plt.axis('off')
     plt.title('Matchup Data Table')
-    
+
     # Create a table and add it to the plot
     table = plt.table(cellText=df.values,
                       rowLabels=df.index,
                       colLabels=df.columns,
                       cellLoc='center',
                       loc='center')
-    
+
     # Adjust table properties for better readability
     table.auto_set_font_size(False)
     table.set_fontsize(10)
     table.scale(1.2, 1.2)
-    
+
     # Add color coding based on win ratios
+    total = (x_wins + o_wins).values
+    win_ratios = x_wins.values / total.clip(min=1)
     for i in range(len(df.index)):
         for j in range(len(df.columns)):
-            cell = table[i+1, j]
-            x_wins, o_wins = df.iloc[i, j]
-            total = x_wins + o_wins
-            if total > 0:
-                win_ratio = x_wins / total
-                cell_color = plt.cm.RdYlGn(win_ratio)
-                cell.set_facecolor(cell_color)
-    
+            if total[i, j] > 0:
+                table[i+1, j].set_facecolor(plt.cm.RdYlGn(win_ratios[i, j]))
+
     plt.tight_layout()
     plt.show()
 
 
-def show_compared_data(data, baseline_name, total_games=100):
-    player_names = data.columns[1:]
-    matchup_data = [[extract_wins(player_row[opponent]) for opponent in data.columns[1:]] for _, player_row in data.iterrows()]
-    baseline = {}
-    n = len(player_names)
-    for i in range(n):
-        for j in range(i+1, n):
-            i_name = player_names[i]
-            j_name = player_names[j]
-            if i_name == j_name:
-                continue
-            elif i_name == baseline_name:
-                win_rate = baseline.get(j_name)
-                x_wins, o_wins = matchup_data[i][j]
-                num_draws = total_games - x_wins - o_wins
-                current_win_rate = (o_wins + num_draws * 0.5) / total_games
-
-                baseline[j_name] = (win_rate + current_win_rate) / 2 if win_rate is not None else current_win_rate
-            elif j_name == baseline_name:
-                win_rate = baseline.get(i_name)
-                x_wins, o_wins = matchup_data[i][j]
-                num_draws = total_games - x_wins - o_wins
-                current_win_rate = (x_wins + num_draws * 0.5) / total_games
-                baseline[i_name] = (win_rate + current_win_rate) / 2 if win_rate is not None else current_win_rate
+def show_compared_data(data, baseline_name):
+    # Each opponent's score rate against the baseline agent, averaged over both colours
+    x_score, o_score = scores(data)
+    as_x = pd.DataFrame({'opponent': data['x_player'], 'score': x_score})[
+        (data['o_player'] == baseline_name) & (data['x_player'] != baseline_name)]
+    as_o = pd.DataFrame({'opponent': data['o_player'], 'score': o_score})[
+        (data['x_player'] == baseline_name) & (data['o_player'] != baseline_name)]
+    baseline = pd.concat([as_x, as_o]).groupby('opponent', sort=False)['score'].mean()
 
 
     # Plotting the baseline data with win rates displayed on each bar
     plt.figure(figsize=(10, 6))
-    bars = plt.bar(baseline.keys(), baseline.values(), color='skyblue')
+    bars = plt.bar(baseline.index, baseline.values, color='skyblue')
     plt.title(f'{baseline_name} as a baseline')
     # plt.xlabel('Opponent')
     plt.ylabel('Win Rate')
@@ -146,27 +145,15 @@ def show_compared_data(data, baseline_name, total_games=100):
 
     plt.show()
 
-def show_durations(data, total_games=100):
-    player_names = data.columns[1:]
-    matchup_data = [[extract_durations(player_row[opponent]) for opponent in data.columns[1:]] for _, player_row in data.iterrows()]
-    durations = {}
-    n = len(player_names)
-    for i, x_name in enumerate(player_names):
-        for j, o_name in enumerate(player_names):
-            x_duration, o_duration = matchup_data[i][j]
-            saved_duration = durations.get(x_name)
-            if saved_duration is None:
-                durations[x_name] = x_duration
-            else:
-                durations[x_name] = (saved_duration + x_duration) / 2
-            saved_duration = durations.get(o_name)
-            if saved_duration is None:
-                durations[o_name] = o_duration
-            else:
-                durations[o_name] = (saved_duration + o_duration) / 2
+def show_durations(data):
+    # Mean time per game of each agent over all its pairings, as X and as O
+    durations = pd.concat([
+        pd.DataFrame({'player': data['x_player'], 'duration': data['x_duration']}),
+        pd.DataFrame({'player': data['o_player'], 'duration': data['o_duration']}),
+    ]).groupby('player', sort=False)['duration'].mean()
 
     plt.figure(figsize=(10, 6))
-    bars = plt.bar(durations.keys(), durations.values(), color='lightcoral')
+    bars = plt.bar(durations.index, durations.values, color='lightcoral')
     plt.title('Average time agents spend per game')
     # plt.xlabel('Participants')
     plt.ylabel('Time (s)')
@@ -183,14 +170,20 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Analyze Glicko-2 ratings from a CSV file.")
-    parser.add_argument("file_path", type=str, help="Path to the CSV file containing match results.")
-    parser.add_argument("--num_turns", type=int, required=False, default=100, help="Total number of games played.")
+    parser.add_argument("file_path", type=str, help="Path to the competition CSV or game log (.jsonl) with match results.")
+    parser.add_argument("--num_turns", type=int, required=False, default=100,
+                        help="Games per pairing, only needed for CSVs in the older matrix layout.")
+    parser.add_argument("--period", type=int, required=False, default=100,
+                        help="Games per Glicko-2 rating period, for game logs.")
     args = parser.parse_args()
 
-    data = pd.read_csv(args.file_path)
+    data = load_results(args.file_path, args.num_turns)
     show_matchup_data(data)
-    analyze_glicko2(data, args.num_turns)
+    if args.file_path.endswith('.jsonl'):
+        analyze_ratings(args.file_path, args.period)  # Rated game by game
+    else:
+        analyze_glicko2(data)
     show_compared_data(data, "Random")
     show_compared_data(data, "MCTS 0.5s")
     show_compared_data(data, "AI D8E2")
-    show_durations(data, args.num_turns)
\ No newline at end of file
+    show_durations(data)
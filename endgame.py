@@ -0,0 +1,163 @@
+import itertools
+import os
+import pickle
+import time
+from game_board import CellState, GameState
+from search_stats import SearchStats
+
+
+class SolveLimit(Exception):
+    pass
+
+
+class EndgameSolver:
+    # Exact game values of positions with at most max_empty empty cells left on unfinished mini-boards.
+    # Values are from the side to move: 1 win, 0 draw, -1 loss. Every searched position is solved exactly
+    # (a node only stops early on a winning reply), so all of them go into the table keyed by Zobrist hash.
+    # A solve gives up after max_nodes positions or at its deadline, and the player searches normally instead;
+    # the positions it finished stay in the table, so a later attempt gets further
+    def __init__(self, max_empty=12, path=None, max_nodes=10000, max_entries=250000):
+        self.max_empty = max_empty
+        self.max_nodes = max_nodes
+        self.max_entries = max_entries  # The oldest half of the table is dropped when it grows past this
+        self.path = path  # Table file shared by every solver, and every run, using the same path
+        self.table = {}
+        self.new_entries = {}  # Solved since the last save
+        if path is not None:
+            self.table, stored = self.load(path)
+            if len(self.table) > max_entries:
+                self.trim()
+            if stored > 2 * len(self.table):  # Mostly evicted or duplicated entries from concurrent appends
+                self.compact()
+        self.nodes = 0
+        self.probes = 0
+        self.hits = 0
+        self.deadline = None
+        self.stats = SearchStats()  # Of the latest solve
+
+    @staticmethod
+    def load(path):
+        # (table, entries stored) of a file holding a sequence of pickled dicts, one per save
+        table = {}
+        stored = 0
+        if not os.path.exists(path):
+            return table, stored
+        with open(path, 'rb') as file:
+            while True:
+                try:
+                    entries = pickle.load(file)
+                except EOFError:
+                    break
+                except Exception:
+                    break  # A save torn by a crash or a corrupt record: the entries before it are intact
+                if not isinstance(entries, dict):
+                    break
+                table.update(entries)
+                stored += len(entries)
+        return table, stored
+
+    def save(self):
+        # Appends only the entries solved since the last save, so the cost does not grow with the table. The record
+        # normally goes out in one O_APPEND write, which concurrent processes appending to the same file cannot split
+        if not self.new_entries:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        data = pickle.dumps(self.new_entries)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]  # A short write leaves the rest to write, never a torn record
+        finally:
+            os.close(fd)
+        self.new_entries = {}
+
+    def compact(self):
+        # Rewrites the file as the current table, dropping entries evicted by trim
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temporary_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(self.table, file)
+        os.replace(temporary_path, self.path)
+        self.new_entries = {}
+
+    def trim(self):
+        for key in list(itertools.islice(self.table, len(self.table) - self.max_entries // 2)):
+            del self.table[key]
+
+    def empty_cells(self, board):
+        return sum(board.mini_board(i).count(CellState.EMPTY)
+                   for i in range(9) if board.overall_board[i] == GameState.ONGOING)
+
+    def applies(self, board):
+        return not board.terminal() and self.empty_cells(board) <= self.max_empty
+
+    def value(self, board):
+        result = board.result()
+        if result != GameState.ONGOING:
+            return 0 if result == GameState.DRAW else -1  # A won game was won by the player who just moved
+
+        value = self.table.get(board.hash)
+        self.probes += 1
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SolveLimit()
+        if self.deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+            raise SolveLimit()
+        value = -1
+        for action in board.actions():
+            board.make_move(*action)
+            score = -self.value(board)
+            board.undo_move(*action)
+            if score > value:
+                value = score
+                if value == 1:
+                    break
+        self.table[board.hash] = value
+        self.new_entries[board.hash] = value
+        return value
+
+    def move(self, board, start_time, time_limit=None):
+        # The exact move for a player whose time_limit (None = unlimited) started at start_time (perf_counter),
+        # or None when the position does not apply or the solve ran out of nodes or half the time budget
+        if not self.applies(board):
+            return None
+        deadline = start_time + time_limit / 2 if time_limit is not None else None
+        return self.solve(board, deadline)[1]
+
+    def solve(self, board, deadline=None):
+        # (value, best action) of a position that applies(), or (None, None) if the node limit or the
+        # perf_counter deadline was hit first; the caller's board is left untouched
+        board = board.copy()
+        board.score_tracker = None
+        self.nodes = 0
+        self.probes = 0
+        self.hits = 0
+        self.deadline = deadline
+        max_depth = self.empty_cells(board)
+        best_value = -2
+        best_action = None
+        try:
+            for action in board.actions():
+                board.make_move(*action)
+                score = -self.value(board)
+                board.undo_move(*action)
+                if score > best_value:
+                    best_value = score
+                    best_action = action
+                    if best_value == 1:
+                        break
+        except SolveLimit:
+            best_value = best_action = None
+        finally:
+            self.deadline = None
+        if self.path is not None:
+            self.save()
+        if len(self.table) > self.max_entries:
+            self.trim()
+        self.stats = SearchStats(nodes=self.nodes, cache_probes=self.probes, cache_hits=self.hits, max_depth=max_depth)
+        return best_value, best_action
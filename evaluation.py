@@ -1,5 +1,5 @@
 import functools
-from game_board import GameState, CellState
+from game_board import GameState, CellState, WIN_COMBINATIONS
 
 class Evaluation:
     CONFIG_ONE = {
@@ -35,7 +35,7 @@ class Evaluation:
         }
     }
 
-    def __init__(self, config, bonus=False):
+    def __init__(self, config, bonus=False, incremental=False):
         self._win_combinations = [
             [0, 1, 2], [3, 4, 5], [6, 7, 8],  # Rows
             [0, 3, 6], [1, 4, 7], [2, 5, 8],  # Columns
@@ -44,9 +44,18 @@ class Evaluation:
         self.score_map = config['score_map']
         self.overall_score_map = config['overall_score_map']
         self.bonus = bonus
+        self.incremental = incremental
+
+
+    def track(self, board):
+        board.score_tracker = ScoreTracker(self, board)
 
 
     def evaluate(self, board):
+        tracker = board.score_tracker
+        if tracker is not None and tracker.evaluation is self:
+            return tracker.score
+
         score = 0
         for mini_board in board.boards:
             score += self.evaluate_mini_board(tuple(mini_board))
@@ -85,3 +94,75 @@ class Evaluation:
                 score -= 10
 
         return score
+
+
+class LiteEvaluation(Evaluation):
+    # Lite games end on the first mini-board won: any won board is decisive, and otherwise each open
+    # mini-board counts its cells that would win it (threats) and its lines holding one mark and two empty cells
+    WIN_SCORE = 1000
+    THREAT_SCORE = 10
+    LINE_SCORE = 1
+
+    def __init__(self, incremental=False):
+        self._win_combinations = WIN_COMBINATIONS
+        self.bonus = False
+        self.incremental = incremental
+
+
+    @functools.lru_cache(maxsize=None)
+    def evaluate_mini_board(self, board):
+        x_threats = set()
+        o_threats = set()
+        score = 0
+        for line in self._win_combinations:
+            cells = [board[n] for n in line]
+            x_count = cells.count(CellState.X)
+            o_count = cells.count(CellState.O)
+            if x_count == 2 and o_count == 0:
+                x_threats.add(line[cells.index(CellState.EMPTY)])
+            elif o_count == 2 and x_count == 0:
+                o_threats.add(line[cells.index(CellState.EMPTY)])
+            elif x_count == 1 and o_count == 0:
+                score += self.LINE_SCORE
+            elif o_count == 1 and x_count == 0:
+                score -= self.LINE_SCORE
+
+        return score + self.THREAT_SCORE * (len(x_threats) - len(o_threats))
+
+
+    @functools.lru_cache(maxsize=None)
+    def evaluate_overall_board(self, overall_board):
+        if GameState.X_WIN in overall_board:
+            return self.WIN_SCORE
+        elif GameState.O_WIN in overall_board:
+            return -self.WIN_SCORE
+        return 0
+
+
+class ScoreTracker:
+    # Running Evaluation score of a board, updated by make_move/undo_move one mini-board at a time
+    def __init__(self, evaluation, board):
+        self.evaluation = evaluation
+        self.mini_scores = [evaluation.evaluate_mini_board(board.mini_board(i)) for i in range(9)]
+        self.overall_score = evaluation.evaluate_overall_board(tuple(board.overall_board))
+        self.score = sum(self.mini_scores) + self.overall_score
+
+
+    def update(self, board, board_index, state_changed):
+        mini_score = self.evaluation.evaluate_mini_board(board.mini_board(board_index))
+        self.score += mini_score - self.mini_scores[board_index]
+        self.mini_scores[board_index] = mini_score
+
+        if state_changed:
+            overall_score = self.evaluation.evaluate_overall_board(tuple(board.overall_board))
+            self.score += overall_score - self.overall_score
+            self.overall_score = overall_score
+
+
+    def copy(self):
+        new_tracker = ScoreTracker.__new__(ScoreTracker)
+        new_tracker.evaluation = self.evaluation
+        new_tracker.mini_scores = self.mini_scores[:]
+        new_tracker.overall_score = self.overall_score
+        new_tracker.score = self.score
+        return new_tracker
@@ -1,4 +1,5 @@
 from enum import Enum
+import random
 import time
 
 
@@ -33,6 +34,21 @@ class GameState:
         else:
             return 'Game is still ongoing'
 
+WIN_COMBINATIONS = [
+    [0, 1, 2], [3, 4, 5], [6, 7, 8],  # Rows
+    [0, 3, 6], [1, 4, 7], [2, 5, 8],  # Columns
+    [0, 4, 8], [2, 4, 6]  # Diagonals
+]
+LINES_THROUGH = [[line for line in WIN_COMBINATIONS if i in line] for i in range(9)]
+
+# Zobrist keys: one per (player, board * 9 + cell), O to move, next board (index 9 = free choice) and lite rules
+_zobrist_random = random.Random(0x9B3)
+ZOBRIST_CELLS = {player: [_zobrist_random.getrandbits(64) for _ in range(81)] for player in (CellState.X, CellState.O)}
+ZOBRIST_O_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_NEXT_BOARD = [_zobrist_random.getrandbits(64) for _ in range(10)]
+ZOBRIST_LITE = _zobrist_random.getrandbits(64)
+
+
 class NineBoard:
     def __init__(self, lite=False):
         self.boards = [[CellState.EMPTY for _ in range(9)] for _ in range(9)]
@@ -40,27 +56,74 @@ class NineBoard:
         self.current_player = CellState.X
         self.next_board_index = None
         self.lite = lite
-        self._win_combinations = [
-            [0, 1, 2], [3, 4, 5], [6, 7, 8],  # Rows
-            [0, 3, 6], [1, 4, 7], [2, 5, 8],  # Columns
-            [0, 4, 8], [2, 4, 6]  # Diagonals
-        ]
+        self._win_combinations = WIN_COMBINATIONS
+        # Kept up to date by make_move/undo_move so result() never rescans the boards
+        self.game_result = GameState.ONGOING
+        self.open_boards = 9
+        # Zobrist hash of cells, side to move and next board, updated by make_move
+        self.hash = ZOBRIST_NEXT_BOARD[9] ^ (ZOBRIST_LITE if lite else 0)
+        # (board_index, cell_index, next_board_index, board_state, game_result, hash) before each move
+        self.history = []
+        # Optional evaluation.ScoreTracker notified of every move
+        self.score_tracker = None
 
     
     def make_move(self, board_index, cell_index):
+        previous_state = self.overall_board[board_index]
+        self.history.append((board_index, cell_index, self.next_board_index, previous_state, self.game_result, self.hash))
+        self.hash ^= self.next_board_key() ^ ZOBRIST_CELLS[self.current_player][board_index * 9 + cell_index] ^ ZOBRIST_O_TO_MOVE
         self.boards[board_index][cell_index] = self.current_player
         self.current_player = CellState.X if self.current_player == CellState.O else CellState.O
-        self.update_game_state(board_index)
+
+        state = self.update_mini_board_game_state(board_index)
+        if state != previous_state:
+            self.overall_board[board_index] = state
+            self.open_boards -= 1
+            self.update_game_result(board_index, state)
+        if self.score_tracker is not None:
+            self.score_tracker.update(self, board_index, state != previous_state)
 
         self.next_board_index = cell_index
+        self.hash ^= self.next_board_key()
 
     
     def undo_move(self, board_index, cell_index):
+        _, _, next_board_index, previous_state, previous_result, previous_hash = self.history.pop()
         self.current_player = self.boards[board_index][cell_index]
         self.boards[board_index][cell_index] = CellState.EMPTY
-        self.update_game_state(board_index)
 
-        self.next_board_index = board_index
+        state_changed = self.overall_board[board_index] != previous_state
+        if state_changed:
+            self.overall_board[board_index] = previous_state
+            self.open_boards += 1
+        self.game_result = previous_result
+        if self.score_tracker is not None:
+            self.score_tracker.update(self, board_index, state_changed)
+
+        self.next_board_index = next_board_index
+        self.hash = previous_hash
+
+
+    def next_board_key(self):
+        if self.next_board_index is None or self.overall_board[self.next_board_index] != GameState.ONGOING:
+            return ZOBRIST_NEXT_BOARD[9]
+        return ZOBRIST_NEXT_BOARD[self.next_board_index]
+
+
+    def mini_board(self, board_index):
+        return tuple(self.boards[board_index])
+
+
+    def masks(self):
+        x_masks = [0] * 9
+        o_masks = [0] * 9
+        for i, board in enumerate(self.boards):
+            for j, cell in enumerate(board):
+                if cell == CellState.X:
+                    x_masks[i] |= 1 << j
+                elif cell == CellState.O:
+                    o_masks[i] |= 1 << j
+        return x_masks, o_masks
 
 
     def actions(self):
@@ -75,8 +138,20 @@ class NineBoard:
                     if self.boards[self.next_board_index][j] == CellState.EMPTY]
 
     
-    def update_game_state(self, board_index):
-        self.overall_board[board_index] = self.update_mini_board_game_state(board_index)
+    def update_game_result(self, board_index, state):
+        if state != GameState.DRAW:
+            if self.lite:
+                self.game_result = state
+                return
+
+            overall_board = self.overall_board
+            for i, j, k in LINES_THROUGH[board_index]:
+                if overall_board[i] == overall_board[j] == overall_board[k]:
+                    self.game_result = state
+                    return
+
+        if self.open_boards == 0:
+            self.game_result = GameState.DRAW
 
     
     def display_board(self):
@@ -95,21 +170,7 @@ class NineBoard:
 
     
     def result(self):
-        if self.lite:
-            if GameState.X_WIN in self.overall_board:
-                return GameState.X_WIN
-            elif GameState.O_WIN in self.overall_board:
-                return GameState.O_WIN
-        else:
-            for i, j, k in self._win_combinations:
-                v1, v2, v3 = self.overall_board[i], self.overall_board[j], self.overall_board[k]
-                if v1 == v2 == v3:
-                    return v1
-        
-        if GameState.ONGOING in self.overall_board:
-            return GameState.ONGOING
-        else:
-            return GameState.DRAW
+        return self.game_result
 
 
     def copy(self):
@@ -118,6 +179,12 @@ class NineBoard:
         new_board.overall_board = self.overall_board[:]
         new_board.current_player = self.current_player
         new_board.next_board_index = self.next_board_index
+        new_board.game_result = self.game_result
+        new_board.open_boards = self.open_boards
+        new_board.hash = self.hash
+        new_board.history = self.history[:]
+        if self.score_tracker is not None:
+            new_board.score_tracker = self.score_tracker.copy()
         return new_board
 
 
@@ -136,19 +203,35 @@ class NineBoard:
         else:
             return GameState.DRAW
     
-    def play_game(self, x_player, o_player, show_board=False):
+    def play_game(self, x_player, o_player, show_board=False, move_log=None):
+        # With a move_log list, appends (ply, wall_time, cpu_time, branching_factor, free_choice, search_stats)
+        # for each move, search_stats being the mover's SearchStats as a dict (None for players without one).
+        # CPU time is this process's only, so it leaves out work done in other processes
         x_duration = 0.0
         o_duration = 0.0
         while not self.terminal():
             best_move = None
+            if move_log is not None:
+                ply = len(self.history)
+                branching_factor = len(self.actions())
+                free_choice = self.next_board_index is None or \
+                    self.overall_board[self.next_board_index] != GameState.ONGOING
+                start_cpu = time.process_time()
             if self.current_player == CellState.X:
-                start_time = time.time()
+                start_time = time.perf_counter()
                 best_move = x_player.make_decision(self)
-                x_duration += time.time() - start_time
+                duration = time.perf_counter() - start_time
+                x_duration += duration
             else:
-                start_time = time.time()
+                start_time = time.perf_counter()
                 best_move = o_player.make_decision(self)
-                o_duration += time.time() - start_time
+                duration = time.perf_counter() - start_time
+                o_duration += duration
+            if move_log is not None:
+                player = x_player if self.current_player == CellState.X else o_player
+                stats = getattr(player, 'stats', None)
+                move_log.append((ply, duration, time.process_time() - start_cpu, branching_factor, free_choice,
+                                 stats.as_dict() if stats is not None else None))
 
             if best_move:
                 self.make_move(*best_move)
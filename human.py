@@ -1,7 +1,10 @@
+from search_stats import SearchStats
+
 
 class HumanPlayer:
     def __init__(self):
         self.name = None
+        self.stats = SearchStats()  # Nothing to count, kept for a uniform player interface
 
     def make_decision(self, board):
         if self.name is None:
@@ -0,0 +1,42 @@
+import functools
+from bit_board import WIN_CELLS, FULL_MASK
+from game_board import CellState, GameState
+
+
+@functools.lru_cache(maxsize=None)
+def board_threats(cells):
+    # (X's winning cells, O's winning cells, occupied cells) of one mini-board, each as a 9-bit mask
+    x_mask = sum(1 << i for i, cell in enumerate(cells) if cell == CellState.X)
+    o_mask = sum(1 << i for i, cell in enumerate(cells) if cell == CellState.O)
+    return WIN_CELLS[x_mask] & ~o_mask, WIN_CELLS[o_mask] & ~x_mask, x_mask | o_mask
+
+
+def tactical_actions(board, actions):
+    # Lite games end on the first mini-board won, so one move of lookahead is exact: a move that wins a board
+    # is played alone, and moves that let the opponent win a board next are dropped unless nothing else is left
+    x_to_move = board.current_player == CellState.X
+    threats = [board_threats(board.mini_board(i)) if state == GameState.ONGOING else None
+               for i, state in enumerate(board.overall_board)]
+    for action in actions:
+        own_wins = threats[action[0]][0 if x_to_move else 1]
+        if own_wins >> action[1] & 1:
+            return [action]
+
+    # Open boards where the opponent could already complete a line
+    other = 1 if x_to_move else 0
+    threatened = [t is not None and t[other] != 0 for t in threats]
+    total_threatened = sum(threatened)
+    safe = []
+    for board_index, cell_index in actions:
+        other_wins, occupied = threats[board_index][other] & ~(1 << cell_index), threats[board_index][2]
+        board_open = occupied | 1 << cell_index != FULL_MASK
+        if cell_index != board_index and threats[cell_index] is not None:
+            loses = threatened[cell_index]
+        elif cell_index == board_index and board_open:
+            loses = other_wins != 0
+        else:
+            # The opponent may play anywhere; this board only stays a target if it is still open
+            loses = total_threatened - threatened[board_index] > 0 or board_open and other_wins != 0
+        if not loses:
+            safe.append((board_index, cell_index))
+    return safe or actions
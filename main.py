@@ -1,94 +1,147 @@
 import multiprocessing as mp
-from itertools import product
+import os
 import pandas as pd
 from datetime import datetime
 
 from game_board import NineBoard, GameState
 from minimax import MiniMaxPlayer
+from move_ordering import MoveOrdering
 from mcts import MCTSPlayer
-from evaluation import Evaluation
+from parallel_mcts import ParallelMCTSPlayer
+from evaluation import Evaluation, LiteEvaluation
+from endgame import EndgameSolver
 from random_player import RandomPlayer
 from human import HumanPlayer
+from ratings import RatingEngine
+from sprt import SPRT
+from tournament import (run_tournament, pairings_frame, summarize_games, latency_percentiles, search_stats_summary,
+                        profile_matchup)
 
 
-def create_player_list(limit=None):
+def create_player_list(limit=None, lite=False):
+    # One exact endgame table shared by every search agent and kept on disk between runs.
+    # Lite games add agents built for them to the full list; a limited list, such as the competition roster, is unchanged
+    endgame = EndgameSolver(12, 'data/endgame_table.pkl')
     players = [
         RandomPlayer('Random'),
-        MiniMaxPlayer('AI D4E1', Evaluation(Evaluation.CONFIG_ONE), 4),
-        MiniMaxPlayer('AI D4E2', Evaluation(Evaluation.CONFIG_TWO, True), 4),
-        MiniMaxPlayer('AI D6E1', Evaluation(Evaluation.CONFIG_ONE), 6),
-        MiniMaxPlayer('AI D6E2', Evaluation(Evaluation.CONFIG_TWO, True), 6),
-        MiniMaxPlayer('AI D8E1', Evaluation(Evaluation.CONFIG_ONE), 8),
-        MiniMaxPlayer('AI D8E2', Evaluation(Evaluation.CONFIG_TWO, True), 8),
-        MCTSPlayer('MCTS 0.5s', 0.5),
-        MCTSPlayer('MCTS 1.0s', 1.0),
-        MCTSPlayer('MCTS 2.0s', 2.0),
+        MiniMaxPlayer('AI D4E1', Evaluation(Evaluation.CONFIG_ONE, incremental=True), 4, ordering=MoveOrdering(), endgame=endgame),
+        MiniMaxPlayer('AI D4E2', Evaluation(Evaluation.CONFIG_TWO, True, incremental=True), 4, ordering=MoveOrdering(), endgame=endgame),
+        MiniMaxPlayer('AI D6E1', Evaluation(Evaluation.CONFIG_ONE, incremental=True), 6, ordering=MoveOrdering(), endgame=endgame),
+        MiniMaxPlayer('AI D6E2', Evaluation(Evaluation.CONFIG_TWO, True, incremental=True), 6, ordering=MoveOrdering(), endgame=endgame),
+        MiniMaxPlayer('AI D8E1', Evaluation(Evaluation.CONFIG_ONE, incremental=True), 8, ordering=MoveOrdering(), endgame=endgame),
+        MiniMaxPlayer('AI D8E2', Evaluation(Evaluation.CONFIG_TWO, True, incremental=True), 8, ordering=MoveOrdering(), endgame=endgame),
+        MCTSPlayer('MCTS 0.5s', 0.5, solver=True, endgame=endgame),
+        MCTSPlayer('MCTS 1.0s', 1.0, solver=True, endgame=endgame),
+        MCTSPlayer('MCTS 2.0s', 2.0, solver=True, endgame=endgame),
+        ParallelMCTSPlayer('MCTS 1.0s Parallel', 1.0, solver=True, endgame=endgame),
     ]
     if limit is not None:
         return players[:limit]
+    if lite:
+        players += [
+            MiniMaxPlayer('AI D4EL', LiteEvaluation(incremental=True), 4, ordering=MoveOrdering(), endgame=endgame,
+                          tactical=True),
+            MiniMaxPlayer('AI D6EL', LiteEvaluation(incremental=True), 6, ordering=MoveOrdering(), endgame=endgame,
+                          tactical=True),
+            MCTSPlayer('MCTS 0.5s Tactical', 0.5, solver=True, endgame=endgame, tactical=True),
+        ]
     return players
 
 def play_single_game(x_player, o_player, lite):
     board = NineBoard(lite)
     result, x_duration, o_duration = board.play_game(x_player, o_player)
-    return result, x_duration, o_duration
+    return {'result': result, 'x_duration': x_duration, 'o_duration': o_duration}
 
-def play_games_parallel(x_player, o_player, num_games, lite):
+def play_games_parallel(x_player, o_player, num_games, lite, sprt=None):
+    # With an sprt.SPRT, games are played a pool-sized batch at a time, num_games being only the cap,
+    # until the test settles the pairing; the summary then covers the games actually played
     with mp.Pool() as pool:
-        results = pool.starmap(play_single_game, 
-                               [(x_player, o_player, lite)] * num_games)
-    
-    x_wins = 0
-    o_wins = 0
-    x_total_duration = 0
-    o_total_duration = 0
-    for result, x_duration, o_duration in results:
-        if result == GameState.X_WIN:
-            x_wins += 1
-        elif result == GameState.O_WIN:
-            o_wins += 1
-        x_total_duration += x_duration
-        o_total_duration += o_duration
-    
-    average_x_duration = x_total_duration / num_games
-    average_o_duration = o_total_duration / num_games
-    
-    return (x_wins, o_wins), average_x_duration, average_o_duration
-
-def host_competition(participants, num_games, lite):
-    total_results = []
-    player_combinations = list(product(participants, repeat=2))
-    
-    for x_player, o_player in player_combinations:
-        result = play_games_parallel(x_player, o_player, num_games, lite)
-        total_results.append(result)
-        
-        (x_win, o_win), average_x_duration, average_o_duration = result
-        print(f"{x_player.name} vs {o_player.name}: {x_win} - {o_win}")
+        if sprt is None:
+            results = pool.starmap(play_single_game, 
+                                   [(x_player, o_player, lite)] * num_games)
+        else:
+            results = []
+            batch = os.cpu_count()
+            while len(results) < num_games and not sprt.settled([r['result'] for r in results]):
+                results.extend(pool.starmap(play_single_game,
+                                            [(x_player, o_player, lite)] * min(batch, num_games - len(results))))
+    return summarize_games(results)
+
+def print_ratings(ratings):
+    print(f"Ratings after {ratings.games} games ({ratings.periods} rating periods):")
+    for name, rating in ratings.ratings().items():
+        print(f"  {name}: {rating['rating']:.0f} (95% CI {rating['low']:.0f} - {rating['high']:.0f})")
+    print()
+
+
+def host_competition(participants, num_games, lite, log_path=None, ratings=None, sprt=None):
+    # Every game of every pairing shares one worker pool; pairings are reported as they complete.
+    # Finished games stream to log_path, and a run restarted on the same log skips the games in it.
+    # A RatingEngine passed as ratings is fed every game as it finishes. With an sprt.SPRT, a pairing
+    # stops once the test settles it, and the pairing rows record how many games each one used
+    records = []
+    on_game = ratings.add_record if ratings is not None else None
+    periods = 0
+    for x_index, o_index, games in run_tournament(participants, num_games, lite, log_path=log_path, on_game=on_game,
+                                                  sprt=sprt):
+        records.extend(games)
+        (x_win, o_win), average_x_duration, average_o_duration = summarize_games(games)
+        print(f"{participants[x_index].name} vs {participants[o_index].name}: {x_win} - {o_win}"
+              + (f" (settled after {len(games)} games)" if len(games) < num_games else ""))
         print(f"X Duration: {average_x_duration}")
         print(f"O Duration: {average_o_duration}")
         print()
-    
-    names = [p.name for p in participants]
-    len_participants = len(participants)
-    len_total_results = len(total_results)
-    return (names, [total_results[i:i+len_participants] for i in range(0, len_total_results, len_participants)])
+        if ratings is not None and ratings.periods > periods:
+            periods = ratings.periods
+            print_ratings(ratings)
+
+    if ratings is not None:
+        ratings.end_period()
+        print_ratings(ratings)
+
+    latencies = latency_percentiles(records)
+    for name, latency in latencies.items():
+        print(f"{name} move time p50/p95/p99: "
+              f"{latency['wall_p50']:.4f}s / {latency['wall_p95']:.4f}s / {latency['wall_p99']:.4f}s")
 
+    search_stats = search_stats_summary(records)
+    for name, stats in search_stats.items():
+        print(f"{name} per move: {stats['nodes']:.0f} nodes, {stats['evaluations']:.0f} evaluations, "
+              f"{stats['playouts']:.0f} playouts, max depth {stats['max_depth']}")
+
+    names = [p.name for p in participants]
+    return (names, pairings_frame(records, names), latencies, search_stats)
 
-def run_competition(lite=False, turns=100):
-    participants = create_player_list(8)
-    names, total_results = host_competition(participants, turns, lite)
 
-    # Create a figure and a set of subplots
-    df = pd.DataFrame(total_results, index=names, columns=names)
+def run_competition(lite=False, turns=100, resume=None, min_turns=None):
+    # With min_turns, each pairing plays between min_turns and turns games, stopping once an SPRT settles it
+    participants = create_player_list(8, lite)
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    file_name = f'data/results_compeition_a1_lite_{timestamp}.csv' if lite \
-                else f'data/results_compeition_a1_{timestamp}.csv'
-    df.to_csv(file_name, index=False)
+    log_path = resume or (f'data/games_a1_lite_{timestamp}.jsonl' if lite else f'data/games_a1_{timestamp}.jsonl')
+    print(f"Logging games to {log_path}")
+    # Rebuilt from the whole log on resume, so the rating periods match an uninterrupted run
+    ratings_file_name = f'data/ratings_a1_lite_{timestamp}.json' if lite else f'data/ratings_a1_{timestamp}.json'
+    ratings = RatingEngine(period_games=len(participants) ** 2, snapshot_path=ratings_file_name)
+    sprt = SPRT(min_games=min_turns) if min_turns is not None else None
+    names, pairings, latencies, search_stats = host_competition(participants, turns, lite, log_path, ratings, sprt)
+
+    # One typed row per pairing (see tournament.PAIRING_COLUMNS)
+    file_name = f'data/results_competition_a1_lite_{timestamp}.csv' if lite \
+                else f'data/results_competition_a1_{timestamp}.csv'
+    pairings.to_csv(file_name, index=False)
+    latency_file_name = f'data/latency_a1_lite_{timestamp}.csv' if lite else f'data/latency_a1_{timestamp}.csv'
+    pd.DataFrame.from_dict(latencies, orient='index').to_csv(latency_file_name, index_label='player')
+    stats_file_name = f'data/search_stats_a1_lite_{timestamp}.csv' if lite else f'data/search_stats_a1_{timestamp}.csv'
+    pd.DataFrame.from_dict(search_stats, orient='index').to_csv(stats_file_name, index_label='player')
+
+
+def profile_competition(x_name, o_name, lite=False, turns=1, players=None):
+    players = {player.name: player for player in players or create_player_list(lite=lite)}
+    profile_matchup(players[x_name], players[o_name], turns, lite)
 
 
 def play_with_human(lite=False):
-    players = create_player_list()
+    players = create_player_list(lite=lite)
     print("Choose a player to play against:")
     for i, player in enumerate(players):
         print(f"{i+1}. {player.name}")
@@ -112,7 +165,7 @@ def play_with_human(lite=False):
 
 
 def play_with_two_AIs(lite=False):
-    players = create_player_list()
+    players = create_player_list(lite=lite)
     print("Choose two players to play against each other:")
     for i, player in enumerate(players):
         print(f"{i+1}. {player.name}")
@@ -150,8 +203,19 @@ if __name__ == '__main__':
                         help='Play a lite game with winning condition on any board in nine boards')
     parser.add_argument('-t', '--turns',
                         type=int,
-                        default=100,
-                        help='Number of turns to play in competition mode')
+                        help='Number of turns to play in competition mode (default: 100, or 1 when profiling)')
+    parser.add_argument('-r', '--resume',
+                        metavar='LOG',
+                        help='Continue the competition recorded in this game log, skipping games already in it')
+    parser.add_argument('-a', '--adaptive',
+                        type=int,
+                        metavar='MIN_TURNS',
+                        help='In competition mode, stop each pairing once a sequential probability ratio test '
+                             'settles it, after at least MIN_TURNS and at most TURNS games')
+    parser.add_argument('-p', '--profile',
+                        nargs=2,
+                        metavar=('X_PLAYER', 'O_PLAYER'),
+                        help='In competition mode, profile TURNS games of this one pairing instead of the tournament')
 
     args = parser.parse_args()
 
@@ -160,4 +224,13 @@ if __name__ == '__main__':
     elif args.mode == 'AI':
         play_with_two_AIs(args.lite)
     elif args.mode == 'competition':
-        run_competition(args.lite, args.turns)
+        if args.profile:
+            players = create_player_list(lite=args.lite)
+            names = [player.name for player in players]
+            unknown = [name for name in args.profile if name not in names]
+            if unknown:
+                parser.error(f"unknown player {', '.join(map(repr, unknown))}; "
+                             f"choose from: {', '.join(map(repr, names))}")
+            profile_competition(*args.profile, args.lite, args.turns or 1, players)
+        else:
+            run_competition(args.lite, args.turns or 100, args.resume, args.adaptive)
@@ -1,20 +1,49 @@
 import math
 import random
+import sys
 import time
 from game_board import GameState, CellState, NineBoard
+from lite import tactical_actions
+from rollout import playout
+from search_stats import SearchStats
+
+
+def score_result(result, mover):
+    # 1 for a win, 0.5 for a draw and 0 for a loss of the player who made the last move into a node
+    if result == GameState.DRAW:
+        return 0.5
+    elif mover == CellState.X and result == GameState.X_WIN or \
+        mover == CellState.O and result == GameState.O_WIN:
+        return 1
+    else:
+        return 0
+
+
+def moves_mask(actions):
+    mask = 0
+    for board_index, cell_index in actions:
+        mask |= 1 << (board_index * 9 + cell_index)
+    return mask
 
 
 class MCTSNode:
-    def __init__(self, board, parent=None, move=None):
-        self.board = board
+    # Nodes hold no board: MCTSPlayer replays moves from its root board while descending
+    __slots__ = ('parent', 'move', 'children', 'visits', 'score', 'untried', 'proven', 'amaf_visits', 'amaf_score')
+
+    def __init__(self, parent=None, move=None):
         self.parent = parent
         self.move = move
         self.children = []
         self.visits = 0
         self.score = 0
+        self.untried = None  # Bitmask over board_index * 9 + cell_index, filled on first visit
+        self.proven = None  # Solver only: exact score_result value once the node is solved
+        # RAVE only: all-moves-as-first statistics, from simulations where this move was played later on
+        self.amaf_visits = 0
+        self.amaf_score = 0
 
-    def add_child(self, child_board, move):
-        child = MCTSNode(child_board, self, move)
+    def add_child(self, move):
+        child = MCTSNode(self, move)
         self.children.append(child)
         return child
 
@@ -22,74 +51,237 @@ class MCTSNode:
         self.visits += 1
         self.score += result
 
+    def update_amaf(self, result):
+        self.amaf_visits += 1
+        self.amaf_score += result
+
+    def rave_value(self, rave_k):
+        # Blends the AMAF mean into the UCT mean with weight beta = sqrt(k / (3n + k)),
+        # which shrinks with real visits n and equals 1/2 at n = rave_k
+        value = self.score / self.visits
+        if not self.amaf_visits:
+            return value
+        beta = (rave_k / (3 * self.visits + rave_k)) ** 0.5
+        return (1 - beta) * value + beta * self.amaf_score / self.amaf_visits
+
     def fully_expanded(self):
-        return len(self.children) == len(self.board.actions())
+        return self.untried == 0
 
-    def best_child(self, c_param=1.4): # c_param is a constant that balances exploitation and exploration. 2**0.5 for pure UCB1
-        choices_weights = [
-            (c.score / c.visits) + c_param * ((math.log(self.visits) / c.visits) ** 0.5) # UCB1 formula
-            for c in self.children
-        ]
-        return self.children[choices_weights.index(max(choices_weights))]
+    def pop_untried(self):
+        bit = self.untried & -self.untried
+        self.untried ^= bit
+        return divmod(bit.bit_length() - 1, 9)
+
+    def best_child(self, c_param=1.4, skip_proven=False, rave_k=None): # c_param is a constant that balances exploitation and exploration. 2**0.5 for pure UCB1
+        children = [c for c in self.children if c.proven is None] if skip_proven else self.children
+        if rave_k is None:
+            choices_weights = [
+                (c.score / c.visits) + c_param * ((math.log(self.visits) / c.visits) ** 0.5) # UCB1 formula
+                for c in children
+            ]
+        else:
+            choices_weights = [
+                c.rave_value(rave_k) + c_param * ((math.log(self.visits) / c.visits) ** 0.5)
+                for c in children
+            ]
+        return children[choices_weights.index(max(choices_weights))]
+
+
+# Approximate memory of one tree node: the slotted node, its children list and its move tuple
+NODE_BYTES = sys.getsizeof(MCTSNode()) + sys.getsizeof([]) + sys.getsizeof((0, 0))
 
 
 class MCTSPlayer:
-    def __init__(self, name, time_limit=1, c_param=1.4):
+    def __init__(self, name, time_limit=1, c_param=1.4, reuse_tree=True, rollout='fast', solver=False,
+                 iterations=None, max_nodes=None, max_memory=None, seed=None, check_every=32,
+                 rave=False, rave_k=300, endgame=None, tactical=False):
         self.name = name
-        self.time_limit = time_limit
+        # Budgets: the search stops at whichever of these (None = unlimited) runs out first
+        self.time_limit = time_limit  # Seconds, with the clock read every check_every iterations
+        self.iterations = iterations
+        self.max_nodes = max_nodes
+        self.max_memory = max_memory  # Bytes of tree, converted to a node limit via NODE_BYTES
+        self.check_every = check_every
+        self.seed = seed
+        self.rng = random.Random(seed)
         self.c_param = c_param
+        self.reuse_tree = reuse_tree
+        self.rollout = rollout  # 'fast' plays out on scratch bitmasks, 'board' on a NineBoard copy
+        self.solver = solver  # MCTS-Solver: propagate proven wins, losses and draws up the tree
+        # RAVE: blend all-moves-as-first playout statistics into selection, weighted equally
+        # with the real visit statistics once a child has rave_k visits
+        self.rave = rave
+        self.rave_k = rave_k
+        self.endgame = endgame  # endgame.EndgameSolver that plays exactly once few enough empty cells remain
+        # Lite games only: expand just the tactically sound moves (lite.tactical_actions) and let fast
+        # playouts take any available board win
+        self.tactical = tactical
+        self.root = None
+        self.root_board = None
+        self.playouts = 0
+        self.tree_size = 0  # Upper bound: each iteration adds at most one node
+        self.stats = SearchStats()  # Filled in by every search
+
+    def __setstate__(self, state):
+        # An unseeded player copied into another process (e.g. a play_games_parallel task) draws fresh
+        # OS entropy there, rather than replaying the random sequence it was pickled with
+        self.__dict__.update(state)
+        if self.seed is None:
+            self.rng = random.Random()
+
+    def reset(self):
+        # Drops the tree kept for reuse, so a game depends only on its own moves
         self.root = None
+        self.root_board = None
+
+    def node_limit(self):
+        limits = [limit for limit in (self.max_nodes, self.max_memory and self.max_memory // NODE_BYTES)
+                  if limit is not None]
+        return min(limits) if limits else None
 
     def make_decision(self, board):
-        self.root = MCTSNode(board)
-        end_time = time.time() + self.time_limit
+        start_time = time.perf_counter()
+        if self.endgame is not None:
+            action = self.endgame.move(board, start_time, self.time_limit)  # The search gets whatever time is left
+            if action is not None:
+                self.stats = self.endgame.stats
+                return action
+        root = self.search(board, start_time)
+        children = root.children
+        if self.solver:
+            winning = [c for c in children if c.proven == 1]
+            if winning:
+                return winning[0].move
+            children = [c for c in children if c.proven != 0] or children
+        return max(children, key=lambda c: c.visits).move
+
+    def search(self, board, start_time=None):
+        # start_time (perf_counter) is when the time budget started running, by default now
+        self.root = (self.reused_root(board) if self.reuse_tree else None) or MCTSNode()
+        self.root_board = board.copy()
+        root_ply = len(self.root_board.history)
+        self.playouts = 0
+        self.tree_size = self.root.visits + 1
+        node_limit = self.node_limit()
+        if start_time is None:
+            start_time = time.perf_counter()
+        end_time = start_time + self.time_limit if self.time_limit is not None else None
+        iterations = 0
+        max_depth = 0
+
+        while self.root.proven is None:
+            leaf = self.select(self.root, self.root_board)
+            child = self.expand(leaf, self.root_board)
+            if child is not leaf:
+                self.tree_size += 1
+            moves = [entry[0] * 9 + entry[1] for entry in self.root_board.history[root_ply:]] if self.rave else None
+            depth = len(self.root_board.history) - root_ply
+            max_depth = max(max_depth, depth)
+            result = self.simulate(self.root_board, moves)
+            self.playouts += 1
+            self.backpropagate(child, result, moves, depth)
+            self.rewind(self.root_board, root_ply)
 
-        while time.time() < end_time:
-            leaf = self.select(self.root)
-            child = self.expand(leaf)
-            result = self.simulate(child)
-            self.backpropagate(child, result)
+            iterations += 1
+            if self.iterations is not None and iterations >= self.iterations:
+                break
+            if node_limit is not None and self.tree_size >= node_limit:
+                break
+            if end_time is not None and iterations % self.check_every == 0 and time.perf_counter() >= end_time:
+                break
 
-        return max(self.root.children, key=lambda c: c.visits).move
+        self.stats = SearchStats(nodes=iterations, max_depth=max_depth, tree_size=self.tree_size, playouts=self.playouts)
+        return self.root
 
-    def select(self, node):
-        while not node.board.terminal():
+    def reused_root(self, board):
+        # Descends the previous tree along the moves played since its root, if the game continues from it
+        if self.root is None:
+            return None
+        ply = len(self.root_board.history)
+        if len(board.history) <= ply:
+            return self.root if self.root_board.hash == board.hash else None
+        if board.history[ply][-1] != self.root_board.hash:  # Hash before the first new move
+            return None
+
+        node = self.root
+        for entry in board.history[ply:]:
+            move = entry[:2]
+            node = next((c for c in node.children if c.move == move), None)
+            if node is None:
+                return None
+        node.parent = None
+        return node
+
+    def rewind(self, board, ply):
+        while len(board.history) > ply:
+            board_index, cell_index = board.history[-1][:2]
+            board.undo_move(board_index, cell_index)
+
+    def select(self, node, board):
+        while not board.terminal():
+            if node.untried is None:
+                actions = board.actions()
+                node.untried = moves_mask(tactical_actions(board, actions) if self.tactical and board.lite else actions)
             if not node.fully_expanded():
                 return node
-            node = node.best_child(self.c_param)
+            node = node.best_child(self.c_param, self.solver, self.rave_k if self.rave else None)
+            board.make_move(*node.move)
         return node
 
-    def expand(self, node):
-        if node.board.terminal():
+    def expand(self, node, board):
+        if board.terminal():
             return node
-        
-        existing_moves = [c.move for c in node.children]
-        for action in node.board.actions():
-            if action not in existing_moves:
-                new_board = node.board.copy()
-                new_board.make_move(*action)
-                return node.add_child(new_board, action)
-        return node  # In case all actions are expanded
-
-    def simulate(self, node):
-        board = node.board.copy()
-        while not board.terminal():
-            action = random.choice(board.actions())
-            board.make_move(*action)
-        result = board.result()
-        
-        if result == GameState.DRAW:
-            return 0.5
-        elif board.current_player == CellState.O and result == GameState.X_WIN or \
-            board.current_player == CellState.X and result == GameState.O_WIN:
-            return 1
+
+        move = node.pop_untried()
+        mover = board.current_player
+        board.make_move(*move)
+        child = node.add_child(move)
+        if self.solver and board.terminal():
+            child.proven = score_result(board.result(), mover)
+            self.propagate_proof(child)
+        return child
+
+    def propagate_proof(self, node):
+        # A node is lost for the player who moved into it if the opponent has a proven winning reply,
+        # otherwise solved once every reply is solved
+        parent = node.parent
+        while parent is not None and parent.proven is None:
+            if node.proven == 1:
+                parent.proven = 0
+            elif parent.untried == 0 and all(c.proven is not None for c in parent.children):
+                parent.proven = 1 - max(c.proven for c in parent.children)
+            else:
+                break
+            node, parent = parent, parent.parent
+
+    def simulate(self, board, moves=None):
+        # Scored for the player who moved into the node being simulated. Moves played are appended to moves if given
+        mover = CellState.X if board.current_player == CellState.O else CellState.O
+        if self.rollout == 'fast':
+            result = playout(board, self.rng, moves, self.tactical)
         else:
-            return 0
+            board = board.copy()
+            while not board.terminal():
+                action = self.rng.choice(board.actions())
+                board.make_move(*action)
+                if moves is not None:
+                    moves.append(action[0] * 9 + action[1])
+            result = board.result()
+        return score_result(result, mover)
 
-    def backpropagate(self, node, result):
+    def backpropagate(self, node, result, moves=None, depth=0):
+        # For RAVE, moves holds every move of the simulation from the root (tree path, then playout)
+        # and depth is the number of tree moves leading to node
         while node is not None:
             node.update(result)
+            if moves is not None and node.children:
+                # AMAF: credit each child whose move the player to move here played at any later ply
+                played = set(moves[depth::2])
+                for child in node.children:
+                    if child.move[0] * 9 + child.move[1] in played:
+                        child.update_amaf(1 - result)
             node = node.parent
+            depth -= 1
             result = 1 - result  # Flip the result for the opponent 0 -> 1, 1 -> 0
 
 
@@ -116,6 +308,32 @@ def test_c_values(opponent, duration=1, num_games=100):
 
     return results
 
+
+def test_rave_values(iterations=1000, num_games=100, c_param=1.4, rollout='fast', lite=True):
+    # RAVE against plain UCB1 at an equal number of playouts per move, alternating colours
+    rave_values = [30, 100, 300, 1000, 3000]
+    results = {}
+
+    for k in rave_values:
+        rave_player = MCTSPlayer('MCTS RAVE', None, c_param, rollout=rollout, iterations=iterations, rave=True, rave_k=k)
+        ucb_player = MCTSPlayer('MCTS UCB1', None, c_param, rollout=rollout, iterations=iterations)
+        wins = 0
+        draws = 0
+        for game in range(num_games):
+            board = NineBoard(lite=lite)
+            if game % 2 == 0:
+                result, _, _ = board.play_game(rave_player, ucb_player)
+                rave_win = GameState.X_WIN
+            else:
+                result, _, _ = board.play_game(ucb_player, rave_player)
+                rave_win = GameState.O_WIN
+            wins += result == rave_win
+            draws += result == GameState.DRAW
+        results[k] = (wins + 0.5 * draws) / num_games
+        print(f"MCTS RAVE k={k} vs UCB1 at {iterations} playouts: {wins} wins, {draws} draws")
+
+    return results
+
 if __name__ == '__main__':
     from random_player import RandomPlayer
     import matplotlib.pyplot as plt
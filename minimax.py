@@ -1,57 +1,174 @@
 import math
+import time
 from evaluation import Evaluation
 from game_board import CellState, NineBoard, GameState
+from lite import tactical_actions
 from random_player import RandomPlayer
+from search_stats import SearchStats
+from transposition import TranspositionTable
+
+
+class SearchTimeout(Exception):
+    pass
 
 
 class MiniMaxPlayer:
-    def __init__(self, name, evaluation, default_depth=6):
+    def __init__(self, name, evaluation, default_depth=6, table_size=2**18, time_limit=None, ordering=None,
+                 endgame=None, tactical=False):
         self.name = name
         self.evaluation = evaluation
         self.default_depth = default_depth
+        self.table_size = table_size
+        self.table = None  # Created on first use so unused players stay cheap to pickle
+        self.time_limit = time_limit  # Seconds per move; deepens iteratively instead of using default_depth
+        self.deadline = None
+        self.nodes = 0
+        self.pv_moves = {}  # Best move of every exact-score node, reused for ordering by the next iteration
+        self.ordering = ordering  # e.g. move_ordering.MoveOrdering; None keeps board.actions() order
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.endgame = endgame  # endgame.EndgameSolver that plays exactly once few enough empty cells remain
+        self.tactical = tactical  # Lite games only: search just the tactically sound moves (lite.tactical_actions)
+        self.evaluations = 0
+        self.table_probes = 0
+        self.table_hits = 0
+        self.completed_depth = 0
+        self.stats = SearchStats()  # Filled in by every make_decision
+
+    def reset(self):
+        # Forgets what earlier games left behind (transposition table, ordering statistics), so a game
+        # depends only on its own moves; the shared endgame table is kept
+        self.table = None
+        self.pv_moves = {}
+        if self.ordering is not None:
+            self.ordering.reset()
+
+    @property
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def record_cutoff(self, board, action, depth, index):
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if self.ordering is not None:
+            self.ordering.cutoff(board, action, depth)
+
+    def count_node(self):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    def probe(self, board, depth, alpha, beta):
+        # Returns (score or None, alpha, beta, best move to try first)
+        entry = self.table.probe(board.hash) if self.table is not None else None
+        self.table_probes += self.table is not None
+        if entry is None:
+            return None, alpha, beta, self.pv_moves.get(board.hash)
+
+        self.table_hits += 1
+        _, entry_depth, flag, score, move, _ = entry
+        move = self.pv_moves.get(board.hash, move)
+        if entry_depth >= depth:
+            if flag == TranspositionTable.EXACT:
+                return score, alpha, beta, move
+            elif flag == TranspositionTable.LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if beta <= alpha:
+                return score, alpha, beta, move
+        return None, alpha, beta, move
+
+    def store(self, board, depth, score, alpha, beta, move):
+        if score <= alpha:
+            flag = TranspositionTable.UPPER
+        elif score >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+            self.pv_moves[board.hash] = move
+        if self.table is not None:
+            self.table.store(board.hash, depth, flag, score, move)
+
+    def ordered_actions(self, board, first_move, depth):
+        actions = board.actions()
+        if self.tactical and board.lite and depth > 2:  # Near the leaves the filter costs more than the subtrees it prunes
+            actions = tactical_actions(board, actions)
+        if self.ordering is not None and depth > 1:
+            self.ordering.order(board, actions)
+        if first_move is not None and first_move in actions:
+            actions.remove(first_move)
+            actions.insert(0, first_move)
+        return actions
 
     def max_value(self, board, depth, alpha, beta):
         if board.terminal() or depth == 0:
+            self.evaluations += 1
             return self.evaluation.evaluate(board)
 
+        self.count_node()
+        original_alpha, original_beta = alpha, beta
+        score, alpha, beta, first_move = self.probe(board, depth, alpha, beta)
+        if score is not None:
+            return score
+
         max_score = -math.inf
-        for action in board.actions():
+        best_action = None
+        for index, action in enumerate(self.ordered_actions(board, first_move, depth)):
             board.make_move(*action)
             score = self.min_value(board, depth - 1, alpha, beta)
             board.undo_move(*action)
-            max_score = max(score, max_score)
+            if score > max_score:
+                max_score = score
+                best_action = action
             alpha = max(score, alpha)
             if beta <= alpha:
+                self.record_cutoff(board, action, depth, index)
                 break
 
+        self.store(board, depth, max_score, original_alpha, original_beta, best_action)
         return max_score
 
 
     def min_value(self, board, depth, alpha, beta):
         if board.terminal() or depth == 0:
+            self.evaluations += 1
             return self.evaluation.evaluate(board)
 
+        self.count_node()
+        original_alpha, original_beta = alpha, beta
+        score, alpha, beta, first_move = self.probe(board, depth, alpha, beta)
+        if score is not None:
+            return score
+
         min_score = math.inf
-        for action in board.actions():
+        best_action = None
+        for index, action in enumerate(self.ordered_actions(board, first_move, depth)):
             board.make_move(*action)
             score = self.max_value(board, depth - 1, alpha, beta)
             board.undo_move(*action)
-            min_score = min(score, min_score)
+            if score < min_score:
+                min_score = score
+                best_action = action
             beta = min(score, beta)
             if beta <= alpha:
+                self.record_cutoff(board, action, depth, index)
                 break
         
+        self.store(board, depth, min_score, original_alpha, original_beta, best_action)
         return min_score
 
 
-    def x_decision(self, board):
-        depth = self.default_depth
+    def x_decision(self, board, depth=None):
+        depth = self.default_depth if depth is None else depth
         best_score = -math.inf
         best_action = None
         alpha = -math.inf
         beta = math.inf
 
-        for action in board.actions():
+        _, _, _, first_move = self.probe(board, depth, alpha, beta)
+        for action in self.ordered_actions(board, first_move, depth):
             board.make_move(*action)
             score = self.min_value(board, depth - 1, alpha, beta)
             board.undo_move(*action)
@@ -65,17 +182,19 @@ class MiniMaxPlayer:
             if beta <= alpha:
                 break
 
+        self.store(board, depth, best_score, -math.inf, math.inf, best_action)
         return best_action
 
 
-    def o_decision(self, board):
-        depth = self.default_depth
+    def o_decision(self, board, depth=None):
+        depth = self.default_depth if depth is None else depth
         best_score = math.inf
         best_action = None
         alpha = -math.inf
         beta = math.inf
 
-        for action in board.actions():
+        _, _, _, first_move = self.probe(board, depth, alpha, beta)
+        for action in self.ordered_actions(board, first_move, depth):
             board.make_move(*action)
             score = self.max_value(board, depth - 1, alpha, beta)
             board.undo_move(*action)
@@ -89,10 +208,71 @@ class MiniMaxPlayer:
             if beta <= alpha:
                 break
 
+        self.store(board, depth, best_score, -math.inf, math.inf, best_action)
         return best_action
     
+    def prepare_search(self, board):
+        if self.evaluation.incremental or self.time_limit is not None:
+            board = board.copy()  # A timed-out search leaves its moves on the board
+        if self.evaluation.incremental:
+            self.evaluation.track(board)
+        if self.table_size:
+            if self.table is None:
+                self.table = TranspositionTable(self.table_size)
+            self.table.new_search()
+        self.pv_moves = {}
+        self.nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.evaluations = 0
+        self.table_probes = 0
+        self.table_hits = 0
+        self.completed_depth = 0
+        if self.ordering is not None:
+            self.ordering.new_search()
+        return board
+
+    def search_stats(self):
+        return SearchStats(nodes=self.nodes, cutoffs=self.cutoffs, evaluations=self.evaluations,
+                           cache_probes=self.table_probes, cache_hits=self.table_hits, max_depth=self.completed_depth)
+
+    def endgame_move(self, board, start_time):
+        # The exact move, or None when there is none or the solve ran out of nodes or half the time budget
+        if self.endgame is not None:
+            action = self.endgame.move(board, start_time, self.time_limit)
+            if action is not None:
+                self.stats = self.endgame.stats
+            return action
+        return None
+
     def make_decision(self, board):
-        return self.x_decision(board) if board.current_player == CellState.X else self.o_decision(board)
+        start_time = time.perf_counter()
+        action = self.endgame_move(board, start_time)
+        if action is not None:
+            return action
+        board = self.prepare_search(board)
+        decision = self.x_decision if board.current_player == CellState.X else self.o_decision
+        if self.time_limit is None:
+            action = decision(board)
+            self.completed_depth = self.default_depth
+        else:
+            action = self.iterative_deepening(board, decision, start_time)
+        self.stats = self.search_stats()
+        return action
+
+    def iterative_deepening(self, board, decision, start_time=None):
+        best_action = None
+        self.deadline = (start_time if start_time is not None else time.perf_counter()) + self.time_limit
+        try:
+            for depth in range(1, 82 - len(board.history)):
+                best_action = decision(board, depth)
+                self.completed_depth = depth
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+
+        return best_action if best_action is not None else board.actions()[0]
     
 
 
@@ -111,4 +291,4 @@ if __name__ == '__main__':
         o_total_duration += o_duration
     print(f"Win rate for Minimax Player vs Random Player: {wins / 100 * 100}%")
     print(f"Average duration for X: {x_total_duration / 100}")
-    print(f"Average duration for O: {o_total_duration / 100}")
\ No newline at end of file
+    print(f"Average duration for O: {o_total_duration / 100}")
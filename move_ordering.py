@@ -0,0 +1,60 @@
+from game_board import CellState, GameState, LINES_THROUGH
+
+
+class MoveOrdering:
+    WIN_BONUS = 4
+    KILLER_BONUS = 2
+    BLOCK_BONUS = 1
+    FREE_CHOICE_PENALTY = 1  # Sending the opponent to a finished board lets them play anywhere
+
+    def __init__(self, killer_slots=2):
+        self.killer_slots = killer_slots
+        self.killers = {}  # ply -> most recent cutoff moves at that ply
+        self.history = [0] * 81  # board_index * 9 + cell_index -> accumulated cutoff depth**2
+
+    def reset(self):
+        self.killers = {}
+        self.history = [0] * 81
+
+    def new_search(self):
+        self.killers = {}
+        self.history = [value // 2 for value in self.history]
+
+    def static_score(self, cells, move, player, opponent, overall_board):
+        board_index, cell_index = move
+        score = 0
+        for i, j, k in LINES_THROUGH[cell_index]:
+            others = [cells[n] for n in (i, j, k) if n != cell_index]
+            if others[0] == others[1]:
+                if others[0] == player:
+                    score += self.WIN_BONUS
+                elif others[0] == opponent:
+                    score += self.BLOCK_BONUS
+        if cell_index != board_index and overall_board[cell_index] != GameState.ONGOING:
+            score -= self.FREE_CHOICE_PENALTY
+        return score
+
+    def order(self, board, actions):
+        player = board.current_player
+        opponent = CellState.X if player == CellState.O else CellState.O
+        killers = self.killers.get(len(board.history), ())
+        cells = {}
+
+        def priority(move):
+            board_index = move[0]
+            if board_index not in cells:
+                cells[board_index] = board.mini_board(board_index)
+            score = self.static_score(cells[board_index], move, player, opponent, board.overall_board)
+            if move in killers:
+                score += self.KILLER_BONUS
+            # History only breaks ties between moves of equal static/killer priority
+            return score, self.history[board_index * 9 + move[1]]
+
+        actions.sort(key=priority, reverse=True)
+
+    def cutoff(self, board, move, depth):
+        ply = len(board.history)
+        killers = self.killers.get(ply, [])
+        if move not in killers:
+            self.killers[ply] = [move] + killers[:self.killer_slots - 1]
+        self.history[move[0] * 9 + move[1]] += depth * depth
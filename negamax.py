@@ -0,0 +1,145 @@
+import math
+import time
+from game_board import CellState, NineBoard
+from minimax import MiniMaxPlayer
+
+
+class NegamaxPlayer(MiniMaxPlayer):
+    # Principal-variation search in negamax form. Scores are relative to the side to move,
+    # so the transposition table of this player is not interchangeable with MiniMaxPlayer's.
+    def __init__(self, name, evaluation, default_depth=6, table_size=2**18, time_limit=None, ordering=None,
+                 aspiration_window=20, endgame=None, tactical=False):
+        super().__init__(name, evaluation, default_depth, table_size, time_limit, ordering, endgame, tactical)
+        self.aspiration_window = aspiration_window
+        self.previous_score = None
+        self.previous_ply = None
+
+    def negamax(self, board, depth, alpha, beta):
+        if board.terminal() or depth == 0:
+            self.evaluations += 1
+            score = self.evaluation.evaluate(board)
+            return score if board.current_player == CellState.X else -score
+
+        self.count_node()
+        original_alpha, original_beta = alpha, beta
+        score, alpha, beta, first_move = self.probe(board, depth, alpha, beta)
+        if score is not None:
+            return score
+
+        best_score = -math.inf
+        best_action = None
+        for index, action in enumerate(self.ordered_actions(board, first_move, depth)):
+            board.make_move(*action)
+            if index == 0:
+                score = -self.negamax(board, depth - 1, -beta, -alpha)
+            else:
+                # Evaluation scores are integers, so (alpha, alpha + 1) is a null window
+                score = -self.negamax(board, depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self.negamax(board, depth - 1, -beta, -score)
+            board.undo_move(*action)
+
+            if score > best_score:
+                best_score = score
+                best_action = action
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.record_cutoff(board, action, depth, index)
+                break
+
+        self.store(board, depth, best_score, original_alpha, original_beta, best_action)
+        return best_score
+
+    def root_search(self, board, depth, alpha, beta):
+        # Plain PVS at the root: a later move must beat the best so far to replace it, so ties go to the
+        # move searched first, as with MiniMaxPlayer's strict comparison over the same ordered moves
+        _, _, _, first_move = self.probe(board, depth, alpha, beta)
+
+        best_score = -math.inf
+        best_action = None
+        for index, action in enumerate(self.ordered_actions(board, first_move, depth)):
+            board.make_move(*action)
+            if index == 0:
+                score = -self.negamax(board, depth - 1, -beta, -alpha)
+            else:
+                score = -self.negamax(board, depth - 1, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self.negamax(board, depth - 1, -beta, -score)
+            board.undo_move(*action)
+
+            if score > best_score:
+                best_score = score
+                best_action = action
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        return best_score, best_action
+
+    def decision(self, board, depth):
+        if self.previous_score is None or not self.aspiration_window:
+            score, action = self.root_search(board, depth, -math.inf, math.inf)
+        else:
+            alpha = self.previous_score - self.aspiration_window
+            beta = self.previous_score + self.aspiration_window
+            score, action = self.root_search(board, depth, alpha, beta)
+            if score <= alpha or score >= beta:
+                score, action = self.root_search(board, depth, -math.inf, math.inf)
+
+        self.previous_score = score
+        self.store(board, depth, score, -math.inf, math.inf, action)
+        return action
+
+    def reset(self):
+        super().reset()
+        self.previous_score = None
+        self.previous_ply = None
+
+    def make_decision(self, board):
+        start_time = time.perf_counter()
+        action = self.endgame_move(board, start_time)
+        if action is not None:
+            self.previous_score = None
+            return action
+        board = self.prepare_search(board)
+        if self.time_limit is not None:
+            self.previous_score = None
+            action = self.iterative_deepening(board, self.decision, start_time)
+            self.stats = self.search_stats()
+            return action
+
+        # A fixed-depth search centres its aspiration window on this player's previous decision
+        if self.previous_score is not None and len(board.history) != self.previous_ply + 2:
+            self.previous_score = None
+        self.previous_ply = len(board.history)
+        action = self.decision(board, self.default_depth)
+        self.completed_depth = self.default_depth
+        self.stats = self.search_stats()
+        return action
+
+
+if __name__ == '__main__':
+    from main import create_player_list
+    from move_ordering import MoveOrdering
+
+    # Benchmark against MiniMaxPlayer over the same positions at the create_player_list depths
+    for player in create_player_list():
+        if not isinstance(player, MiniMaxPlayer):
+            continue
+        negamax_player = NegamaxPlayer(player.name + ' PVS', player.evaluation, player.default_depth,
+                                       ordering=MoveOrdering() if player.ordering else None)
+        board = NineBoard()
+        stats = {player.name: [0, 0.0], negamax_player.name: [0, 0.0]}
+        same_moves = 0
+        for _ in range(10):
+            moves = []
+            for p in (player, negamax_player):
+                start_time = time.perf_counter()
+                moves.append(p.make_decision(board))
+                stats[p.name][0] += p.nodes
+                stats[p.name][1] += time.perf_counter() - start_time
+            same_moves += moves[0] == moves[1]
+            board.make_move(*moves[0])
+        for name, (nodes, duration) in stats.items():
+            print(f"{name}: {nodes} nodes, {duration:.2f}s")
+        print(f"Same moves: {same_moves}/10")
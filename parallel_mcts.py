@@ -0,0 +1,130 @@
+import multiprocessing as mp
+import random
+import time
+from mcts import MCTSPlayer
+from search_stats import SearchStats
+
+
+def worker_loop(connection, seed, time_limit, c_param, options):
+    player = MCTSPlayer('worker', time_limit, c_param, seed=seed, **options)
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        if task == 'reset':
+            player.reset()
+            continue
+        board, start_time = task  # perf_counter is system-wide, so the parent's start_time holds here too
+        root = player.search(board, start_time)
+        connection.send(([(c.move, c.visits, c.score, c.proven) for c in root.children], player.stats))
+    connection.close()
+
+
+class ParallelMCTSPlayer:
+    # Root parallelisation: every worker process grows its own tree for the same time_limit,
+    # and the root children statistics are summed before the most visited move is chosen
+    def __init__(self, name, time_limit=1, c_param=1.4, workers=None, seed=None, **options):
+        self.name = name
+        self.time_limit = time_limit
+        self.c_param = c_param
+        self.workers = workers or mp.cpu_count()
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.options = options  # Passed on to each worker's MCTSPlayer
+        self.connections = []
+        self.processes = []
+        self.serial_player = None
+        self.playouts = 0
+        self.stats = SearchStats()  # Summed over the workers' searches
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['connections'] = []
+        state['processes'] = []
+        return state
+
+    def start(self):
+        for i in range(self.workers):
+            parent_connection, child_connection = mp.Pipe()
+            process = mp.Process(target=worker_loop,
+                                 args=(child_connection, self.seed + i, self.time_limit, self.c_param, self.options),
+                                 daemon=True)
+            process.start()
+            child_connection.close()
+            self.connections.append(parent_connection)
+            self.processes.append(process)
+
+    def reset(self):
+        if self.serial_player is not None:
+            self.serial_player.reset()
+        for connection in self.connections:
+            connection.send('reset')
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def make_decision(self, board):
+        if mp.current_process().daemon:
+            # Pool workers (e.g. in host_competition) may not start processes: search in this process instead
+            if self.serial_player is None:
+                self.serial_player = MCTSPlayer(self.name, self.time_limit, self.c_param, **self.options)
+            move = self.serial_player.make_decision(board)
+            self.playouts = self.serial_player.playouts
+            self.stats = self.serial_player.stats
+            return move
+
+        start_time = time.perf_counter()
+        endgame = self.options.get('endgame')  # Solved here: the workers only ever search
+        if endgame is not None:
+            action = endgame.move(board, start_time, self.time_limit)
+            if action is not None:
+                self.stats = endgame.stats
+                return action
+
+        if not self.processes:
+            self.start()
+        for connection in self.connections:
+            connection.send((board, start_time))
+
+        totals = {}
+        proofs = {}
+        worker_stats = []
+        for connection in self.connections:
+            children, stats = connection.recv()
+            worker_stats.append(stats)
+            for move, visits, score, proven in children:
+                total = totals.setdefault(move, [0, 0])
+                total[0] += visits
+                total[1] += score
+                if proven is not None:
+                    proofs[move] = proven
+
+        self.stats = SearchStats.merge(worker_stats)
+        self.playouts = self.stats.playouts
+
+        # A worker that solved its root stops early, so its proofs outrank the merged visit counts
+        winning = [move for move, proven in proofs.items() if proven == 1]
+        if winning:
+            return winning[0]
+        moves = [move for move in totals if proofs.get(move) != 0] or list(totals)
+        return max(moves, key=lambda move: totals[move][0])
+
+
+if __name__ == '__main__':
+    from game_board import NineBoard
+
+    # Total playouts per move for 1..cpu_count workers at the same time budget
+    board = NineBoard()
+    board.make_move(4, 4)
+    for workers in range(1, mp.cpu_count() + 1):
+        player = ParallelMCTSPlayer(f'MCTS x{workers}', 1.0, workers=workers)
+        player.make_decision(board)  # Warm up the worker processes
+        start_time = time.perf_counter()
+        player.make_decision(board)
+        print(f"{workers} workers: {player.playouts} playouts in {time.perf_counter() - start_time:.2f}s")
+        player.close()
@@ -1,8 +1,10 @@
 import random
+from search_stats import SearchStats
 
 class RandomPlayer:
     def __init__(self, name):
         self.name = name
+        self.stats = SearchStats()  # Nothing to count, kept for a uniform player interface
 
     def make_decision(self, board):
         actions = board.actions()
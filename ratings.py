@@ -0,0 +1,130 @@
+import json
+import os
+from glicko2 import Player
+from game_board import GameState
+
+
+class RatingEngine:
+    # Glicko-2 ratings fed one game at a time. Games are buffered into rating periods of period_games games;
+    # at the end of a period every player is rated at once against its opponents' ratings from the start of
+    # the period, as Glicko-2 prescribes, so the order of games within a period does not matter
+    def __init__(self, period_games=100, rating=1500, rd=350, vol=0.06, snapshot_path=None):
+        self.period_games = period_games
+        self.initial = (rating, rd, vol)
+        self.snapshot_path = snapshot_path  # Rewritten at the end of every period, to follow a running tournament
+        self.players = {}
+        self.pending = []  # (x_name, o_name, x_score) of the current period
+        self.periods = 0
+        self.games = 0
+
+    def player(self, name):
+        if name not in self.players:
+            self.players[name] = Player(*self.initial)
+        return self.players[name]
+
+    def add_game(self, x_name, o_name, result):
+        x_score = 1 if result == GameState.X_WIN else 0 if result == GameState.O_WIN else 0.5
+        self.player(x_name)
+        self.player(o_name)
+        self.pending.append((x_name, o_name, x_score))
+        self.games += 1
+        if len(self.pending) >= self.period_games:
+            self.end_period()
+
+    def add_record(self, record):
+        self.add_game(record['x_player'], record['o_player'], record['result'])
+
+    def update_from_log(self, path):
+        # Adds the games of an append-only game log that this engine has not seen yet
+        from tournament import read_log
+
+        for record in read_log(path)[self.games:]:
+            self.add_record(record)
+
+    def end_period(self):
+        if not self.pending:
+            return
+        start = {name: (player.rating, player.rd) for name, player in self.players.items()}
+        results = {name: ([], [], []) for name in self.players}
+        for x_name, o_name, x_score in self.pending:
+            if x_name == o_name:
+                continue  # Self-play says nothing about strength
+            for name, opponent, score in ((x_name, o_name, x_score), (o_name, x_name, 1 - x_score)):
+                ratings, rds, scores = results[name]
+                ratings.append(start[opponent][0])
+                rds.append(start[opponent][1])
+                scores.append(score)
+
+        for name, player in self.players.items():
+            ratings, rds, scores = results[name]
+            if scores:
+                player.update_player(ratings, rds, scores)
+            else:
+                player.did_not_compete()
+        self.pending = []
+        self.periods += 1
+        if self.snapshot_path is not None:
+            self.save(self.snapshot_path)
+
+    def interval(self, name, z=1.96):
+        # Confidence interval of a rating, 95% for the default z
+        player = self.players[name]
+        return player.rating - z * player.rd, player.rating + z * player.rd
+
+    def ratings(self, z=1.96):
+        # {name: {'rating', 'rd', 'vol', 'low', 'high'}}, strongest first; games of the open period are not counted yet
+        table = {}
+        for name, player in sorted(self.players.items(), key=lambda item: item[1].rating, reverse=True):
+            low, high = self.interval(name, z)
+            table[name] = {'rating': player.rating, 'rd': player.rd, 'vol': player.vol, 'low': low, 'high': high}
+        return table
+
+    def snapshot(self):
+        return {
+            'period_games': self.period_games,
+            'initial': list(self.initial),
+            'periods': self.periods,
+            'games': self.games,
+            'players': {name: [player.rating, player.rd, player.vol] for name, player in self.players.items()},
+            'pending': [list(game) for game in self.pending],
+        }
+
+    @classmethod
+    def from_snapshot(cls, state, snapshot_path=None):
+        engine = cls(state['period_games'], *state['initial'], snapshot_path=snapshot_path)
+        engine.players = {name: Player(*values) for name, values in state['players'].items()}
+        engine.pending = [tuple(game) for game in state['pending']]
+        engine.periods = state['periods']
+        engine.games = state['games']
+        return engine
+
+    def save(self, path):
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(self.snapshot(), file, indent=2)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path, snapshot_path=None):
+        with open(path) as file:
+            return cls.from_snapshot(json.load(file), snapshot_path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Glicko-2 ratings of the games in a competition game log')
+    parser.add_argument('log_path', help='Game log (.jsonl) written by main.py -m competition')
+    parser.add_argument('--period', type=int, default=100, help='Games per rating period')
+    parser.add_argument('--snapshot', help='Rating state to continue from and to save back to')
+    args = parser.parse_args()
+
+    if args.snapshot and os.path.exists(args.snapshot):
+        engine = RatingEngine.load(args.snapshot, args.snapshot)
+    else:
+        engine = RatingEngine(args.period, snapshot_path=args.snapshot)
+    engine.update_from_log(args.log_path)
+    print(f"{engine.games} games in {engine.periods} rating periods ({len(engine.pending)} games pending)")
+    for name, rating in engine.ratings().items():
+        print(f"{name}: {rating['rating']:.0f} (95% CI {rating['low']:.0f} - {rating['high']:.0f}), "
+              f"RD {rating['rd']:.0f}, volatility {rating['vol']:.4f}")
@@ -0,0 +1,89 @@
+import random
+from bit_board import WIN_TABLE, WIN_CELLS, EMPTY_CELLS, FULL_MASK
+from game_board import CellState, GameState
+
+
+EMPTY_COUNTS = [len(cells) for cells in EMPTY_CELLS]
+
+
+def playout(board, rng=random, moves=None, decisive=False):
+    # Plays uniformly random legal moves to the end of the game on scratch occupancy masks,
+    # leaving board untouched, and returns the final GameState.
+    # Each move played is appended to moves (as board_index * 9 + cell_index) when a list is given.
+    # With decisive, lite playouts take any available mini-board win
+    result = board.result()
+    if result != GameState.ONGOING:
+        return result
+
+    x_masks, o_masks = board.masks()
+    x_won = o_won = closed = 0
+    for i, state in enumerate(board.overall_board):
+        if state != GameState.ONGOING:
+            closed |= 1 << i
+            if state == GameState.X_WIN:
+                x_won |= 1 << i
+            elif state == GameState.O_WIN:
+                o_won |= 1 << i
+
+    lite = board.lite
+    decisive = decisive and lite
+    x_turn = board.current_player == CellState.X
+    next_index = board.next_board_index
+    while True:
+        if decisive:
+            # Decisive moves: a player able to win a mini-board does so, which ends a lite game at once
+            own_masks, other_masks = (x_masks, o_masks) if x_turn else (o_masks, x_masks)
+            free_choice = next_index is None or closed >> next_index & 1
+            for i in range(9) if free_choice else (next_index,):
+                wins = WIN_CELLS[own_masks[i]] & ~other_masks[i]
+                if wins and not closed >> i & 1:
+                    if moves is not None:
+                        moves.append(i * 9 + (wins & -wins).bit_length() - 1)
+                    return GameState.X_WIN if x_turn else GameState.O_WIN
+
+        if next_index is None or closed >> next_index & 1:
+            total = 0
+            for i in range(9):
+                if not closed >> i & 1:
+                    total += EMPTY_COUNTS[x_masks[i] | o_masks[i]]
+            pick = rng.randrange(total)
+            for i in range(9):
+                if not closed >> i & 1:
+                    count = EMPTY_COUNTS[x_masks[i] | o_masks[i]]
+                    if pick < count:
+                        board_index = i
+                        cell_index = EMPTY_CELLS[x_masks[i] | o_masks[i]][pick]
+                        break
+                    pick -= count
+        else:
+            board_index = next_index
+            cell_index = rng.choice(EMPTY_CELLS[x_masks[board_index] | o_masks[board_index]])
+        if moves is not None:
+            moves.append(board_index * 9 + cell_index)
+
+        board_bit = 1 << board_index
+        if x_turn:
+            mask = x_masks[board_index] | 1 << cell_index
+            x_masks[board_index] = mask
+            if WIN_TABLE[mask]:
+                closed |= board_bit
+                x_won |= board_bit
+                if lite or WIN_TABLE[x_won]:
+                    return GameState.X_WIN
+            elif mask | o_masks[board_index] == FULL_MASK:
+                closed |= board_bit
+        else:
+            mask = o_masks[board_index] | 1 << cell_index
+            o_masks[board_index] = mask
+            if WIN_TABLE[mask]:
+                closed |= board_bit
+                o_won |= board_bit
+                if lite or WIN_TABLE[o_won]:
+                    return GameState.O_WIN
+            elif mask | x_masks[board_index] == FULL_MASK:
+                closed |= board_bit
+
+        if closed == FULL_MASK:
+            return GameState.DRAW
+        next_index = cell_index
+        x_turn = not x_turn
@@ -0,0 +1,30 @@
+class SearchStats:
+    # What one make_decision call did. Every player exposes one as player.stats after each decision,
+    # leaving at zero the counters that do not apply to it
+    FIELDS = ('nodes', 'cutoffs', 'evaluations', 'cache_probes', 'cache_hits', 'max_depth', 'tree_size', 'playouts')
+
+    def __init__(self, nodes=0, cutoffs=0, evaluations=0, cache_probes=0, cache_hits=0, max_depth=0,
+                 tree_size=0, playouts=0):
+        self.nodes = nodes  # Minimax: interior nodes searched; MCTS: iterations; endgame: positions solved
+        self.cutoffs = cutoffs
+        self.evaluations = evaluations
+        self.cache_probes = cache_probes  # Transposition or endgame table lookups
+        self.cache_hits = cache_hits
+        self.max_depth = max_depth  # Minimax: deepest completed search; MCTS: deepest tree path
+        self.tree_size = tree_size
+        self.playouts = playouts
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @staticmethod
+    def merge(stats_list):
+        # Totals of several searches of the same position, e.g. the workers of a root-parallel search
+        merged = SearchStats()
+        for stats in stats_list:
+            for field in SearchStats.FIELDS:
+                if field == 'max_depth':
+                    merged.max_depth = max(merged.max_depth, stats.max_depth)
+                else:
+                    setattr(merged, field, getattr(merged, field) + getattr(stats, field))
+        return merged
@@ -0,0 +1,60 @@
+import math
+from game_board import GameState
+
+
+class SPRT:
+    # Sequential probability ratio test of X's score rate in one pairing, a draw counting as half a win:
+    # H0 score = 0.5 - delta against H1 score = 0.5 + delta, with error rates alpha and beta. Wins, draws and
+    # losses are modelled as a trinomial, using the usual normal approximation of the log-likelihood ratio
+    # with the score variance measured from the games, so draws shrink the variance instead of being ignored.
+    #
+    # A pairing is settled once the ratio leaves the bounds, never before min_games. Settling for H1 means
+    # X is not weaker than O by delta; settling for H0 means X is not stronger by delta. Neither says the
+    # sides are unequal: evenly matched agents settle too, for one side or the other at random. A pairing
+    # of draws only gives no evidence for either hypothesis, so it never settles and plays the game cap
+    def __init__(self, delta=0.1, alpha=0.05, beta=0.05, min_games=10):
+        self.min_games = min_games
+        self.score0 = 0.5 - delta
+        self.score1 = 0.5 + delta
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def llr(self, results):
+        wins = sum(result == GameState.X_WIN for result in results)
+        losses = sum(result == GameState.O_WIN for result in results)
+        return self.count_llr(wins, len(results) - wins - losses, losses)
+
+    def count_llr(self, wins, draws, losses):
+        games = wins + draws + losses
+        if games == 0:
+            return 0
+        score = (wins + 0.5 * draws) / games
+        variance = (wins + 0.25 * draws) / games - score * score
+        drift = score - (self.score0 + self.score1) / 2
+        if variance <= 0:
+            # Every game had the same outcome: certain evidence, unless it is exactly between the hypotheses
+            return 0 if drift == 0 else math.copysign(math.inf, drift)
+        return games * (self.score1 - self.score0) * drift / variance
+
+    def settled(self, results):
+        if len(results) < self.min_games:
+            return False
+        llr = self.llr(results)
+        return llr <= self.lower or llr >= self.upper
+
+    def games_needed(self, records):
+        # Length of the shortest settled prefix of a pairing's game records, None while the games played so far
+        # (up to the first missing one) do not settle it. Testing game order rather than finishing order keeps
+        # the decision independent of worker timing, so a rerun or resumed run stops at the same game
+        wins = draws = losses = 0
+        for game, record in enumerate(records):
+            if record is None:
+                return None
+            wins += record['result'] == GameState.X_WIN
+            losses += record['result'] == GameState.O_WIN
+            draws += record['result'] == GameState.DRAW
+            if game + 1 >= self.min_games:
+                llr = self.count_llr(wins, draws, losses)
+                if llr <= self.lower or llr >= self.upper:
+                    return game + 1
+        return None
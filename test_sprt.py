@@ -0,0 +1,36 @@
+from game_board import GameState
+from sprt import SPRT
+
+
+def records(results):
+    return [{'result': result} for result in results]
+
+
+def test_all_draws_never_settle():
+    sprt = SPRT()
+    results = [GameState.DRAW] * 1000
+    assert not sprt.settled(results)
+    assert sprt.games_needed(records(results)) is None
+
+
+def test_one_sided_pairing_settles_at_min_games():
+    sprt = SPRT(min_games=10)
+    assert sprt.games_needed(records([GameState.X_WIN] * 100)) == 10
+    assert sprt.games_needed(records([GameState.O_WIN] * 100)) == 10
+    assert not sprt.settled([GameState.X_WIN] * 9)
+
+
+def test_draw_heavy_pairing_settles():
+    # One X win in every five games, the rest drawn: a 60% score
+    sprt = SPRT()
+    results = ([GameState.X_WIN] + [GameState.DRAW] * 4) * 20
+    needed = sprt.games_needed(records(results))
+    assert needed is not None and needed < len(results)
+    assert sprt.llr(results[:needed]) >= sprt.upper
+
+
+def test_missing_game_stops_the_prefix():
+    sprt = SPRT(min_games=10)
+    games = records([GameState.X_WIN] * 20)
+    games[5] = None
+    assert sprt.games_needed(games) is None
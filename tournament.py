@@ -0,0 +1,359 @@
+import ast
+import collections
+import cProfile
+import glob
+import json
+import multiprocessing as mp
+import os
+import pstats
+import queue
+import random
+import pandas as pd
+
+from game_board import GameState, NineBoard
+from search_stats import SearchStats
+
+
+# Set once per pool worker by init_worker, so tasks only carry player indices
+_participants = None
+_lite = False
+
+
+def init_worker(participants, lite):
+    global _participants, _lite
+    _participants = participants
+    _lite = lite
+
+
+def game_seed(seed, x_name, o_name, game):
+    # Stable across runs and processes, unlike hash() of a string
+    return random.Random(f'{seed}:{x_name}:{o_name}:{game}').getrandbits(32)
+
+
+def play_task(task):
+    x_index, o_index, game, seed = task
+    x_player, o_player = _participants[x_index], _participants[o_index]
+    random.seed(seed)
+    for side, player in (('x', x_player), ('o', o_player)):
+        if hasattr(player, 'reset'):
+            player.reset()  # Search state left by the worker's previous game would change this one
+        if hasattr(player, 'rng'):
+            player.rng.seed(f'{seed}:{side}')  # Per side, so the two players of a mirror match draw different numbers
+
+    board = NineBoard(_lite)
+    move_log = []
+    result, x_duration, o_duration = board.play_game(x_player, o_player, move_log=move_log)
+    return x_index, o_index, {
+        'x_player': x_player.name, 'o_player': o_player.name, 'game': game, 'result': result,
+        'x_duration': x_duration, 'o_duration': o_duration, 'moves': len(board.history),
+        'seed': seed, 'lite': _lite, 'move_log': move_log,
+    }
+
+
+def read_log(path):
+    # Records of an append-only game log; a line torn by an interrupted write is ignored
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path) as log:
+        for line in log:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def summarize_games(records):
+    num_games = len(records)
+    x_wins = 0
+    o_wins = 0
+    x_total_duration = 0
+    o_total_duration = 0
+    for record in records:
+        if record['result'] == GameState.X_WIN:
+            x_wins += 1
+        elif record['result'] == GameState.O_WIN:
+            o_wins += 1
+        x_total_duration += record['x_duration']
+        o_total_duration += record['o_duration']
+
+    average_x_duration = x_total_duration / num_games
+    average_o_duration = o_total_duration / num_games
+
+    return (x_wins, o_wins), average_x_duration, average_o_duration
+
+
+# Competition CSV layout: one row per (x_player, o_player) pairing, durations being mean seconds per game
+PAIRING_COLUMNS = {
+    'x_player': str, 'o_player': str, 'games': 'int64', 'x_wins': 'int64', 'o_wins': 'int64', 'draws': 'int64',
+    'x_duration': 'float64', 'o_duration': 'float64',
+}
+
+
+def pairings_frame(records, names=None):
+    # Pairing rows from per-game records, ordered as names (rows as X, then columns as O) when given
+    games = pd.DataFrame.from_records(records, columns=['x_player', 'o_player', 'result', 'x_duration', 'o_duration'])
+    games['x_wins'] = games['result'] == GameState.X_WIN
+    games['o_wins'] = games['result'] == GameState.O_WIN
+    games['draws'] = games['result'] == GameState.DRAW
+    frame = games.groupby(['x_player', 'o_player'], sort=False).agg(
+        games=('result', 'size'), x_wins=('x_wins', 'sum'), o_wins=('o_wins', 'sum'), draws=('draws', 'sum'),
+        x_duration=('x_duration', 'mean'), o_duration=('o_duration', 'mean')).reset_index()
+    if names is not None:
+        order = {name: i for i, name in enumerate(names)}
+        frame = frame.sort_values(['x_player', 'o_player'], key=lambda column: column.map(order), ignore_index=True)
+    return frame.astype(PAIRING_COLUMNS)
+
+
+def load_pairings(path, num_games=100):
+    # A competition CSV as pairing rows. The older layout, a matrix of stringified
+    # ((x_wins, o_wins), x_duration, o_duration) cells without game counts, is parsed once and converted
+    data = pd.read_csv(path)
+    if 'x_player' in data.columns:
+        return data.astype(PAIRING_COLUMNS)
+
+    if data.columns[0].startswith('Unnamed'):
+        names, opponents = list(data.iloc[:, 0]), data.columns[1:]
+    else:
+        names = opponents = data.columns
+    rows = []
+    for name, cells in zip(names, data[opponents].itertuples(index=False)):
+        for opponent, cell in zip(opponents, cells):
+            if isinstance(cell, str):
+                (x_wins, o_wins), x_duration, o_duration = ast.literal_eval(cell)
+                rows.append((name, opponent, num_games, x_wins, o_wins, num_games - x_wins - o_wins,
+                             x_duration, o_duration))
+    return pd.DataFrame(rows, columns=list(PAIRING_COLUMNS)).astype(PAIRING_COLUMNS)
+
+
+def load_games(path):
+    # A game log as one typed row per game, without the per-move logs
+    games = pd.DataFrame.from_records(read_log(path)).drop(columns='move_log', errors='ignore')
+    return games.astype({'result': 'int64', 'x_duration': 'float64', 'o_duration': 'float64', 'moves': 'int64'})
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an ascending list
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def latency_percentiles(records, percentiles=(50, 95, 99)):
+    # Per-agent percentiles of single-move wall and CPU time, from the move_log of each game record
+    times = {}
+    for record in records:
+        for ply, wall_time, cpu_time, *_ in record.get('move_log', ()):
+            name = record['x_player'] if ply % 2 == 0 else record['o_player']  # X always moves at even plies
+            wall_times, cpu_times = times.setdefault(name, ([], []))
+            wall_times.append(wall_time)
+            cpu_times.append(cpu_time)
+
+    latencies = {}
+    for name, (wall_times, cpu_times) in times.items():
+        wall_times.sort()
+        cpu_times.sort()
+        latencies[name] = {'moves': len(wall_times)}
+        for p in percentiles:
+            latencies[name][f'wall_p{p}'] = percentile(wall_times, p)
+        for p in percentiles:
+            latencies[name][f'cpu_p{p}'] = percentile(cpu_times, p)
+    return latencies
+
+
+def search_stats_summary(records):
+    # Per-agent mean SearchStats counters per move (max_depth: deepest of any move), from the game records' move logs
+    totals = {}
+    for record in records:
+        for ply, *_, stats in record.get('move_log', ()):
+            if stats is None:
+                continue
+            name = record['x_player'] if ply % 2 == 0 else record['o_player']
+            total = totals.setdefault(name, dict.fromkeys(SearchStats.FIELDS, 0))
+            total['moves'] = total.get('moves', 0) + 1
+            for field in SearchStats.FIELDS:
+                if field == 'max_depth':
+                    total[field] = max(total[field], stats[field])
+                else:
+                    total[field] += stats[field]
+
+    summary = {}
+    for name, total in totals.items():
+        moves = total.pop('moves')
+        summary[name] = {'moves': moves}
+        for field, value in total.items():
+            summary[name][field] = value if field == 'max_depth' else value / moves
+    return summary
+
+
+# Where profiled time goes, by the module a function is defined in
+PROFILE_CATEGORIES = {
+    'board': ('game_board.py', 'bit_board.py'),
+    'evaluation': ('evaluation.py', 'lite.py'),
+    'search': ('minimax.py', 'negamax.py', 'move_ordering.py', 'transposition.py', 'endgame.py'),
+    'tree': ('mcts.py', 'parallel_mcts.py'),
+    'rollout': ('rollout.py', 'batch_rollout.py'),
+}
+
+
+def profile_matchup(x_player, o_player, num_games=1, lite=False, top=25):
+    # Plays num_games of one pairing in this process under cProfile, then prints the hottest functions
+    # and the share of time spent in board operations, evaluation, search, tree management and rollouts
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(num_games):
+        NineBoard(lite).play_game(x_player, o_player)
+    profiler.disable()
+
+    stats = pstats.Stats(profiler)
+    stats.sort_stats('tottime').print_stats(top)
+    shares = dict.fromkeys(PROFILE_CATEGORIES, 0.0)
+    shares['other'] = 0.0
+    for (file_name, _, _), (_, _, total_time, _, _) in stats.stats.items():
+        category = next((name for name, modules in PROFILE_CATEGORIES.items()
+                         if os.path.basename(file_name) in modules), 'other')
+        shares[category] += total_time
+    for category, seconds in shares.items():
+        print(f"{category}: {seconds:.2f}s ({seconds / stats.total_tt:.1%})")
+    return shares
+
+
+def historical_durations(lite, pattern=os.path.join('data', 'results_*.csv')):
+    # Mean seconds per game of each (x_name, o_name) pairing across earlier competition CSVs of the same mode
+    frames = [load_pairings(path) for path in sorted(glob.glob(pattern))
+              if ('_lite' in os.path.basename(path)) == lite]
+    if not frames:
+        return {}
+    pairings = pd.concat(frames, ignore_index=True)
+    seconds = (pairings['x_duration'] + pairings['o_duration']).groupby([pairings['x_player'], pairings['o_player']])
+    return seconds.mean().to_dict()
+
+
+def expected_duration(x_name, o_name, durations):
+    # Pairings never played before are as slow as the slower player's average pairing
+    if (x_name, o_name) in durations:
+        return durations[(x_name, o_name)]
+    if not durations:
+        return 0.0
+    default = sum(durations.values()) / len(durations)
+
+    def player_average(name):
+        values = [d for pair, d in durations.items() if name in pair]
+        return sum(values) / len(values) if values else default
+
+    return max(player_average(x_name), player_average(o_name))
+
+
+def schedule(participants, num_games, durations, seed=0, skip=()):
+    # Every game of the round robin as an (x_index, o_index, game, seed) task, longest expected first,
+    # leaving out the (x_name, o_name, game) keys in skip
+    pairings = [(i, j) for i in range(len(participants)) for j in range(len(participants))]
+    expected = {(i, j): expected_duration(participants[i].name, participants[j].name, durations)
+                for i, j in pairings}
+    pairings.sort(key=lambda pair: expected[pair], reverse=True)  # Stable: ties stay in round-robin order
+    tasks = []
+    for i, j in pairings:
+        x_name, o_name = participants[i].name, participants[j].name
+        for game in range(num_games):
+            if (x_name, o_name, game) not in skip:
+                tasks.append((i, j, game, game_seed(seed, x_name, o_name, game)))
+    return tasks
+
+
+def pairing_games(games, sprt=None):
+    # The records a pairing is decided on, or None while it still needs games: all of them,
+    # or with an SPRT the shortest prefix that settles it
+    if sprt is not None:
+        needed = sprt.games_needed(games)
+        if needed is not None:
+            return games[:needed]
+    return games if all(g is not None for g in games) else None
+
+
+def run_tournament(participants, num_games, lite, processes=None, durations=None, log_path=None, seed=0,
+                   on_game=None, sprt=None):
+    # Plays the whole round robin on one persistent pool, yielding (x_index, o_index, records)
+    # as soon as each pairing's last game finishes. With log_path, every finished game is appended
+    # to that log as one JSON line, and games already in it are taken from it instead of replayed.
+    # on_game(record) is called for every game counted in the results: as it finishes, logged games first in
+    # log order. With an sprt.SPRT, num_games is only the cap: a pairing is yielded and no more of its games are
+    # started once the test settles it. Games already running still finish and are logged, but are not counted,
+    # so on_game only sees a pairing's games when it is yielded, in game order
+    if durations is None:
+        durations = historical_durations(lite)
+    names = [p.name for p in participants]
+    finished = {}
+    for record in read_log(log_path) if log_path is not None else []:
+        if record['lite'] == lite and record['game'] < num_games \
+                and record['x_player'] in names and record['o_player'] in names:
+            key = (names.index(record['x_player']), names.index(record['o_player']))
+            finished.setdefault(key, [None] * num_games)[record['game']] = record
+            if on_game is not None and sprt is None:
+                on_game(record)
+    skip = {(names[i], names[j], game) for (i, j), games in finished.items()
+            for game, record in enumerate(games) if record is not None}
+    tasks = schedule(participants, num_games, durations, seed, skip)
+
+    decided = set()
+    for (x_index, o_index), games in list(finished.items()):
+        games = pairing_games(games, sprt)
+        if games is not None:
+            decided.add((x_index, o_index))
+            if on_game is not None and sprt is not None:
+                for record in games:
+                    on_game(record)
+            yield x_index, o_index, games
+    tasks = collections.deque(task for task in tasks if task[:2] not in decided)
+    if not tasks:
+        return
+
+    log = None
+    if log_path is not None:
+        torn = False
+        if os.path.exists(log_path) and os.path.getsize(log_path):
+            with open(log_path, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                torn = file.read(1) != b'\n'
+        log = open(log_path, 'a')
+        if torn:
+            log.write('\n')  # Keep new records off a line torn by an earlier crash
+    try:
+        with mp.Pool(processes, initializer=init_worker, initargs=(participants, lite)) as pool:
+            # Tasks are handed out strictly in schedule order, so the slowest games start first, but only
+            # a few ahead of the workers, so those of a pairing the SPRT has settled can still be dropped
+            results = queue.Queue()
+            window = 2 * (processes or os.cpu_count())
+            running = 0
+            while tasks or running:
+                while tasks and running < window:
+                    task = tasks.popleft()
+                    if task[:2] not in decided:
+                        pool.apply_async(play_task, (task,), callback=results.put, error_callback=results.put)
+                        running += 1
+                if not running:
+                    break
+                result = results.get()
+                running -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                x_index, o_index, record = result
+                if log is not None:
+                    log.write(json.dumps(record) + '\n')
+                    log.flush()
+                if (x_index, o_index) in decided:
+                    continue  # Played after the SPRT settled its pairing: logged, but not counted
+                games = finished.setdefault((x_index, o_index), [None] * num_games)
+                games[record['game']] = record
+                if on_game is not None and sprt is None:
+                    on_game(record)
+                games = pairing_games(games, sprt)
+                if games is not None:
+                    decided.add((x_index, o_index))
+                    del finished[(x_index, o_index)]
+                    if on_game is not None and sprt is not None:
+                        for record in games:
+                            on_game(record)
+                    yield x_index, o_index, games
+    finally:
+        if log is not None:
+            log.close()